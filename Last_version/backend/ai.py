@@ -1,4 +1,7 @@
 import os
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 from openai import AsyncOpenAI
 
 # 1. Initialize the Client with a Groq-compatible model
@@ -6,16 +9,25 @@ from openai import AsyncOpenAI
 
 api_key = os.environ.get('gsk_...Jni4') or ("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")
 
-client = AsyncOpenAI(
-    api_key=api_key,
-    base_url="https://console.groq.com/keys",
-)
 
+def make_client() -> AsyncOpenAI:
+    """NETGUARD_LLM_BASE_URL points the client elsewhere, e.g. at mock_llm_server.py"""
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=os.environ.get('NETGUARD_LLM_BASE_URL', "https://console.groq.com/keys"),
+    )
 
-async def generate_text(prompt: str) -> str:
+
+client = make_client()
+
+# Most LLM requests in flight at once through the AIExecutor
+AI_MAX_CONCURRENCY = int(os.environ.get('NETGUARD_AI_CONCURRENCY', 8))
+
+
+async def generate_text(prompt: str, llm_client: AsyncOpenAI = None) -> str:
     try:
-        response = await client.chat.completions.create(
-            model="llama-3.3-70b-versatile", 
+        response = await (llm_client or client).chat.completions.create(
+            model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": "You are a cybersecurity expert. "
                 "Analyze browser extension threats and provide a 3-sentence summary: "
@@ -28,4 +40,68 @@ async def generate_text(prompt: str) -> str:
         return (response.choices[0].message.content or "").strip()
     except Exception as e:
         print(f"AI API Error: {e}")
-        return "AI analysis unavailable." 
\ No newline at end of file
+        return "AI analysis unavailable."
+
+
+class AIExecutor:
+    """
+    Runs generate_text on one long-lived event loop thread for sync callers.
+
+    The executor owns its own client, and that client (with its keep-alive
+    connection pool) is only ever used from this loop, so connections and TLS sessions are reused across threats
+    instead of being rebuilt for a fresh loop per request. A semaphore caps
+    the requests in flight; submit() is safe to call from any thread.
+    """
+
+    def __init__(self, max_concurrency: int = AI_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.client = make_client()
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ai-executor", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._loop.call_soon(self._started.set)
+        self._loop.run_forever()
+
+    async def _generate(self, prompt: str) -> str:
+        async with self._semaphore:
+            return await generate_text(prompt, self.client)
+
+    def submit(self, prompt: str) -> Future:
+        """Schedule generate_text(prompt) on the executor loop"""
+        return asyncio.run_coroutine_threadsafe(self._generate(prompt), self._loop)
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        """Blocking generate_text for sync code; a request still running after timeout is cancelled"""
+        future = self.submit(prompt)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            return "AI analysis unavailable: timed out."
+
+    def close(self):
+        """Close the client's connections and stop the loop thread"""
+        asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> AIExecutor:
+    """The process-wide AIExecutor, started on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = AIExecutor()
+    return _executor
@@ -0,0 +1,122 @@
+"""
+Cost-aware analysis cascade
+Signatures and ML run on every threat; the LLM stage only runs when the
+cheaper stages leave the verdict open and its budget allows it
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    from metrics import Histogram
+except ImportError:
+    from .metrics import Histogram
+
+STAGES = ('signatures', 'ml', 'llm')
+
+
+class AnalysisCascade:
+    """
+    Early exit: a threat is decided without the LLM when the signature risk
+    score and the ML verdict agree it is clearly benign (no signature hits,
+    no blocklisted hosts, low confidence) or clearly critical (high risk
+    score, high-confidence ML threat). budgets caps how often a stage may run per minute (token bucket);
+    once spent the stage is skipped as 'budget'. Runs, skips by reason and
+    per-stage latency are counted for stats().
+    """
+
+    def __init__(self, benign_max_risk: float = 0.0, benign_max_confidence: float = 0.3,
+                 critical_min_risk: float = 50.0, critical_min_confidence: float = 0.8,
+                 skip_benign: bool = True, skip_critical: bool = True,
+                 budgets: Optional[Dict[str, float]] = None):
+        self.benign_max_risk = benign_max_risk
+        self.benign_max_confidence = benign_max_confidence
+        self.critical_min_risk = critical_min_risk
+        self.critical_min_confidence = critical_min_confidence
+        self.skip_benign = skip_benign
+        self.skip_critical = skip_critical
+        self.budgets = dict(budgets or {})
+        self._tokens = dict(self.budgets)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self.latency_ms = {stage: Histogram([1, 5, 20, 100, 500, 2000, 10000]) for stage in STAGES}
+        self.runs = {stage: 0 for stage in STAGES}
+        self.skips = {stage: {} for stage in STAGES}
+
+    def verdict(self, risk_score: float, ml_result: Dict, domain_hits: int = 0) -> Optional[str]:
+        """
+        'benign' or 'critical' when the cheap stages are decisive, else None.
+        domain_hits: blocklisted hosts found, which the signature risk score doesn't include
+        """
+        if ml_result.get('model_ready') is False:
+            return None
+        confidence = ml_result.get('confidence', 0.0)
+        if risk_score <= self.benign_max_risk and not domain_hits and confidence < self.benign_max_confidence \
+                and not ml_result.get('is_threat'):
+            return 'benign'
+        if risk_score >= self.critical_min_risk and confidence >= self.critical_min_confidence \
+                and ml_result.get('is_threat'):
+            return 'critical'
+        return None
+
+    def early_exit(self, risk_score: float, ml_result: Dict, stage: str = 'llm',
+                   domain_hits: int = 0) -> Optional[str]:
+        """Skip reason for stage when the verdict is already decided (recorded as a skip), else None"""
+        verdict = self.verdict(risk_score, ml_result, domain_hits)
+        if (verdict == 'benign' and self.skip_benign) or (verdict == 'critical' and self.skip_critical):
+            self.skip(stage, f'clearly {verdict}')
+            return f'clearly {verdict}'
+        return None
+
+    def admit(self, stage: str) -> bool:
+        """Take one run from stage's budget; False (recorded as a 'budget' skip) when it is spent"""
+        if self.take(stage):
+            return True
+        self.skip(stage, 'budget')
+        return False
+
+    def take(self, stage: str) -> bool:
+        """Spend one run of stage's per-minute budget; stages without a budget always pass"""
+        if stage not in self.budgets:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self._refilled = now - self._refilled, now
+            for name, per_minute in self.budgets.items():
+                self._tokens[name] = min(per_minute, self._tokens[name] + elapsed * per_minute / 60)
+            if self._tokens[stage] < 1:
+                return False
+            self._tokens[stage] -= 1
+            return True
+
+    def skip(self, stage: str, reason: str):
+        with self._lock:
+            self.skips[stage][reason] = self.skips[stage].get(reason, 0) + 1
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Count a run of stage and record how long it took"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latency_ms[stage].observe((time.perf_counter() - started) * 1000)
+            with self._lock:
+                self.runs[stage] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    'runs': self.runs[stage],
+                    'skipped': dict(self.skips[stage]),
+                    'budget_per_minute': self.budgets.get(stage),
+                    'budget_left': round(self._tokens[stage], 2) if stage in self.budgets else None,
+                }
+                for stage in STAGES
+            }
+        for stage in STAGES:
+            stages[stage]['latency_ms'] = self.latency_ms[stage].to_dict()
+        return stages
@@ -2,13 +2,15 @@ import eventlet
 eventlet.monkey_patch()  
 import json
 import struct
-import asyncio
 from flask import Flask, jsonify, request, render_template
 from flask_socketio import SocketIO
 from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extensions import QueryCanceledError
 from psycopg2.extras import RealDictCursor
 import os
 import sys
+import time
+import multiprocessing
 
 # Get the path to the folder containing app.py
 base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
@@ -36,8 +38,17 @@ ai_path = os.path.join(base_path, 'ai.py')
 if not os.path.exists(ai_path):
     print(f"CRITICAL: ai.py not found at {ai_path}")
 
-from ai import generate_text
-from ml_analyzer import get_analyzer
+from ai import get_executor as get_ai_executor
+from ml_analyzer import (FEATURE_COUNT, MODEL_STORE_DIR, get_analyzer, is_ready as ml_ready, user_data_dir,
+                         warm_up_in_background)
+from result_cache import ResultCache
+from llm_cache import LLMCache
+from model_retraining import RetrainingJob
+from behavior_baselines import BehaviorBaselines
+from enrichment_queue import EnrichmentQueue
+from analysis_cascade import AnalysisCascade
+from deadline import OK, TIMED_OUT, FAILED
+from scan_pipeline import ScanPipeline
 
 app = Flask(__name__)
 app.config[''] = 'security-monitor-key'
@@ -57,6 +68,90 @@ DB_CONFIG = {
 # Threaded pool is essential when combining Flask, SocketIO, and Native Messaging
 db_pool = ThreadedConnectionPool(1, 20, **DB_CONFIG)
 
+# Analysis result cache: in-memory LRU, plus a SQLite file when 'path' is set
+CACHE_CONFIG = {
+    'max_bytes': 64 * 1024 * 1024,
+    'path': os.environ.get('NETGUARD_CACHE_PATH'),
+}
+result_cache = ResultCache(**CACHE_CONFIG)
+
+# LLM answers by normalized prompt fingerprint, always persisted: in its own table of
+# the NETGUARD_CACHE_PATH file, or of llm_cache.sqlite3 in the user data directory
+LLM_CACHE_CONFIG = {
+    'max_bytes': 16 * 1024 * 1024,
+    'path': os.environ.get('NETGUARD_CACHE_PATH') or os.path.join(user_data_dir(), 'llm_cache.sqlite3'),
+    'ttl': float(os.environ.get('NETGUARD_LLM_CACHE_TTL', 24 * 3600)),
+    'table': 'llm_cache',
+}
+llm_cache = LLMCache(ResultCache(**LLM_CACHE_CONFIG))
+
+# Optional IOC blocklist (plain domains, hosts format or a saved .idx index)
+DOMAIN_FEED = os.environ.get('NETGUARD_DOMAIN_FEED')
+
+# Optional directory of JSON/YAML signature rule packs, reloaded when they change
+RULE_PACK_CONFIG = {
+    'directory': os.environ.get('NETGUARD_RULE_PACKS'),
+    'poll_interval': 5.0,
+}
+
+# Periodic refit on verified ml_training_data rows; 'interval' in seconds
+RETRAIN_CONFIG = {
+    'interval': 6 * 3600,
+    'min_rows': 200,
+}
+retraining_job = RetrainingJob(DB_CONFIG, MODEL_STORE_DIR, **RETRAIN_CONFIG)
+
+# Per-extension EWMA baselines of the ML features, flushed to behavioral_patterns
+BASELINE_CONFIG = {
+    'alpha': 0.05,
+    'threshold': 3.0,
+    'warmup': 10,
+    'max_extensions': int(os.environ.get('NETGUARD_BASELINE_MAX_EXTENSIONS', 100_000)),
+}
+BASELINE_FLUSH_INTERVAL = 30.0
+behavior_baselines = BehaviorBaselines(FEATURE_COUNT, **BASELINE_CONFIG)
+
+# LLM analysis runs after ingest: threats are stored with AI_PENDING and updated
+# by the enrichment workers; beyond 'max_size' waiting jobs new threats skip AI
+ENRICH_CONFIG = {
+    'workers': 4,
+    'max_size': 1000,
+}
+AI_TIMEOUT = 30.0  # seconds an enrichment waits for the LLM before giving up
+
+# Each analysis gets 'default_ms' to finish (clients may ask for up to 'max_ms' via
+# deadline_ms / X-Deadline-Ms), split between the scan and ML stages by 'shares'; stages
+# that run out are reported as timed_out and the partial result is returned. The threat
+# is stored either way, with the insert bounded by DB_WRITE_TIMEOUT_MS instead
+DEADLINE_CONFIG = {
+    'default_ms': float(os.environ.get('NETGUARD_DEADLINE_MS', 10000)),
+    'max_ms': 60000.0,
+    'shares': {'scan': 0.6, 'ml': 0.4},
+}
+DB_WRITE_TIMEOUT_MS = 5000
+
+# The LLM stage is skipped when signatures and ML agree a threat is clearly benign
+# or clearly critical; 'budgets' caps stage runs per minute (NETGUARD_LLM_BUDGET_PER_MINUTE)
+CASCADE_CONFIG = {
+    'benign_max_risk': 0.0,
+    'benign_max_confidence': 0.3,
+    'critical_min_risk': 50.0,
+    'critical_min_confidence': 0.8,
+    'budgets': {'llm': float(os.environ['NETGUARD_LLM_BUDGET_PER_MINUTE'])}
+               if os.environ.get('NETGUARD_LLM_BUDGET_PER_MINUTE') else {},
+}
+analysis_cascade = AnalysisCascade(**CASCADE_CONFIG)
+
+# Bulk signature scans; 'max_workers' spreads a batch over a process pool. Batches are
+# untrusted input: they are scanned in linear mode within 'time_budget' seconds, unless
+# NETGUARD_BATCH_BACKTRACKING=1 lets clients ask for the faster backtracking mode
+BATCH_CONFIG = {
+    'max_items': 1000,
+    'max_workers': None,
+    'time_budget': 10.0,
+    'allow_backtracking': os.environ.get('NETGUARD_BATCH_BACKTRACKING') == '1',
+}
+
 def get_db_connection():
     return db_pool.getconn()
 
@@ -84,8 +179,42 @@ def init_db():
                 ml_confidence FLOAT,
                 timestamp TIMESTAMPTZ DEFAULT NOW()
             );
+            ALTER TABLE threats ADD COLUMN IF NOT EXISTS signature_version VARCHAR(100);
             CREATE INDEX IF NOT EXISTS idx_severity ON threats(severity);
             CREATE INDEX IF NOT EXISTS idx_timestamp ON threats(timestamp);
+            -- extensions and behavioral_patterns as in database/schema.sql
+            CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+            CREATE TABLE IF NOT EXISTS extensions (
+                id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                extension_id VARCHAR(255) UNIQUE NOT NULL,
+                name VARCHAR(500) NOT NULL,
+                version VARCHAR(100),
+                description TEXT,
+                permissions JSONB DEFAULT '[]'::jsonb,
+                manifest JSONB,
+                risk_level VARCHAR(50) DEFAULT 'unknown',
+                risk_score FLOAT DEFAULT 0.0,
+                ml_confidence_score FLOAT,
+                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status VARCHAR(50) DEFAULT 'active',
+                is_threat BOOLEAN DEFAULT false,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS behavioral_patterns (
+                id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                extension_id UUID REFERENCES extensions(id) ON DELETE CASCADE,
+                pattern_type VARCHAR(100) NOT NULL,
+                frequency INTEGER DEFAULT 1,
+                data JSONB DEFAULT '{}'::jsonb,
+                anomaly_score FLOAT,
+                is_anomaly BOOLEAN DEFAULT false,
+                first_occurrence TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_occurrence TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_behavioral_patterns_pattern
+                ON behavioral_patterns(extension_id, pattern_type);
         ''')
         conn.commit()
     finally:
@@ -134,74 +263,234 @@ def get_stats():
         release_db_connection(conn)
 
 # Security Analysis Logic
-def process_security_scan(data):
+def process_security_scan(data, deadline_ms=None):
     """Core logic shared by Web API and Native Messaging.
     
     Uses synchronous execution to match Flask's threading async_mode.
+    deadline_ms bounds the analysis (see DEADLINE_CONFIG); the pipeline is scan_pipeline.ScanPipeline.
     """
-    try:
-        intel = ThreatIntelligence()
-        # Scan the code snippet sent by the extension
-        code_results = intel.scan_code(data.get('code', ''))
-        # patterns list for AI/DB use
-        signatures_found = [t['description'] for t in code_results['threats']]
-        data['patterns'] = signatures_found
-
-        # ML Analysis
-        ml_analyzer = get_analyzer()
-        ml_result = ml_analyzer.analyze(data)
-        
-        # AI Prompting
-        prompt = (
-            f"Analyze threat: {data['type']} | Severity: {data['severity']}\n"
-            f"Code Snippet: {data.get('code', 'N/A')[:200]}\n"
-            f"Patterns: {data.get('patterns', [])}\n"
-            f"ML Confidence: {ml_result['confidence']}"
-        )
-        
-        try:
-            loop = asyncio.new_event_loop()
-            ai_response = loop.run_until_complete(generate_text(prompt))
-            loop.close()
-        except Exception as e:
-            ai_response = f"AI analysis unavailable: {str(e)}"
+    return scan_pipeline.scan(data, deadline_ms)
 
-        # Save to DB
+def save_threat(data, ai_response, ml_result, signature_version, deadline):
+    """
+    Insert the threat row and return its id. The insert isn't bounded by the
+    deadline, only by DB_WRITE_TIMEOUT_MS (statement_timeout); None when no
+    pooled connection was free or the insert failed, with the 'db' stage recording why.
+    """
+    started = time.monotonic()
+    try:
         conn = get_db_connection()
-        cur = None
-        try:
-            cur = conn.cursor(cursor_factory=RealDictCursor)
-            cur.execute('''
-                INSERT INTO threats (extension_id, type, code, severity, score, patterns, url, ai_analysis, ml_confidence)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
-            ''', (
-                data.get('extensionId'), data['type'], data.get('code'),
-                data['severity'], data.get('score', 0), data.get('patterns', []),
-                data.get('url'), ai_response, ml_result['confidence']
-            ))
-            threat_id = cur.fetchone()['id']
-            conn.commit()
-            
-            # Real-time update to dashboard
-            result = {'id': threat_id, 'ai_analysis': ai_response, 'ml_result': ml_result, **data}
-            socketio.emit('new_threat', result)
-            return result
-        finally:
-            if cur is not None:
-                cur.close()
-            release_db_connection(conn)
-            
     except Exception as e:
-        print(f"Analysis Error: {e}", file=sys.stderr)
+        print(f"DB Connection Error: {e}", file=sys.stderr)
+        deadline.record('db', FAILED, started)
         return None
+    cur = None
+    try:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute('SET LOCAL statement_timeout = %s', (DB_WRITE_TIMEOUT_MS,))
+        cur.execute('''
+            INSERT INTO threats (extension_id, type, code, severity, score, patterns, url, ai_analysis,
+                                 ml_confidence, signature_version)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+        ''', (
+            data.get('extensionId'), data['type'], data.get('code'),
+            data['severity'], data.get('score', 0), data.get('patterns', []),
+            data.get('url'), ai_response, ml_result['confidence'], signature_version
+        ))
+        threat_id = cur.fetchone()['id']
+        conn.commit()
+        deadline.record('db', OK, started)
+        return threat_id
+    except QueryCanceledError:
+        conn.rollback()
+        deadline.record('db', TIMED_OUT, started)
+        return None
+    except Exception as e:
+        print(f"DB Write Error: {e}", file=sys.stderr)
+        conn.rollback()
+        deadline.record('db', FAILED, started)
+        return None
+    finally:
+        if cur is not None:
+            cur.close()
+        release_db_connection(conn)
+
+def update_ai_analysis(threat_id, ai_analysis):
+    """Write a finished AI analysis back to its threat row"""
+    conn = get_db_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute('UPDATE threats SET ai_analysis = %s WHERE id = %s', (ai_analysis, threat_id))
+        conn.commit()
+    finally:
+        if cur is not None:
+            cur.close()
+        release_db_connection(conn)
+
+def timed_llm_call(prompt):
+    with analysis_cascade.timed('llm'):
+        return get_ai_executor().generate(prompt, timeout=AI_TIMEOUT)
+
+def enrich_threat(job):
+    """Enrichment worker: ask the LLM, store the answer and announce it"""
+    try:
+        # Identical prompts queued together are sent once
+        ai_response = llm_cache.get_or_generate(job['llm_key'], lambda: timed_llm_call(job['prompt']), peeked=True)
+    except Exception as e:
+        ai_response = f"AI analysis unavailable: {str(e)}"
+    update_ai_analysis(job['threat_id'], ai_response)
+
+    # Don't pin a provider outage or a missing ML verdict to this snippet
+    if job['cache_entry'] is not None and not ai_response.startswith("AI analysis unavailable"):
+        result_cache.put(job['cache_key'], {**job['cache_entry'], 'ai_analysis': ai_response})
+    socketio.emit('threat_enriched', {'id': job['threat_id'], 'ai_analysis': ai_response, 'ai_status': 'complete'})
+
+enrichment_queue = EnrichmentQueue(enrich_threat, **ENRICH_CONFIG)
+
+scan_pipeline = ScanPipeline(
+    analysis_cascade, result_cache, llm_cache, behavior_baselines, DEADLINE_CONFIG,
+    get_analyzer=lambda: get_analyzer() if ml_ready() else None,
+    save_threat=save_threat,
+    update_ai_analysis=update_ai_analysis,
+    enqueue=enrichment_queue.submit,
+    emit=lambda result: socketio.emit('new_threat', result),
+)
 
 @app.route('/api/analyze', methods=['POST'])
 def web_analyze():
-    result = process_security_scan(request.json)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'expected a JSON object'}), 400
+    # X-Deadline-Ms header or deadline_ms field: how long the client will wait
+    deadline_ms = data.pop('deadline_ms', None)
+    result = process_security_scan(data, request.headers.get('X-Deadline-Ms', deadline_ms))
     if result:
         return jsonify({'success': True, **result})
     return jsonify({'success': False}), 500
 
+@app.route('/api/scan/stream', methods=['POST'])
+def stream_scan():
+    """Signature scan of a raw (application/octet-stream) bundle body, read in chunks"""
+    result = ThreatIntelligence.scan_file(request.stream)
+    return jsonify({'success': True, **result})
+
+def scan_batch(codes, linear=True):
+    """
+    Signature-scan a batch of at most BATCH_CONFIG['max_items'] snippets and report
+    the throughput. linear=False is only honored when the server allows backtracking.
+    """
+    codes = [code if isinstance(code, str) else '' for code in codes]
+    linear = linear or not BATCH_CONFIG['allow_backtracking']
+    start = time.perf_counter()
+    results = ThreatIntelligence.scan_many(codes, linear=linear, max_workers=BATCH_CONFIG['max_workers'],
+                                           time_budget=BATCH_CONFIG['time_budget'] if linear else None)
+    elapsed = time.perf_counter() - start
+    return {
+        'results': results,
+        'count': len(codes),
+        'unique': len(set(codes)),
+        'linear': linear,
+        'cut_off': sum(1 for result in results if result.get('cut_off_rules')),
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'snippets_per_second': round(len(codes) / elapsed, 1) if elapsed else None,
+    }
+
+@app.route('/api/scan/batch', methods=['POST'])
+def batch_scan():
+    """Signature scan of {"codes": [...]}; results come back in request order"""
+    data = request.json or {}
+    codes = data.get('codes')
+    if not isinstance(codes, list):
+        return jsonify({'success': False, 'error': "'codes' must be a list"}), 400
+    if len(codes) > BATCH_CONFIG['max_items']:
+        return jsonify({'success': False, 'error': f"at most {BATCH_CONFIG['max_items']} snippets per batch",
+                        'max_items': BATCH_CONFIG['max_items']}), 413
+    return jsonify({'success': True, **scan_batch(codes, data.get('linear', True) is not False)})
+
+@app.route('/api/permissions/batch', methods=['POST'])
+def batch_permissions():
+    """Permission risk of a chrome.management.getAll() dump ({"extensions": [ExtensionInfo, ...]})"""
+    extensions = (request.json or {}).get('extensions')
+    if not isinstance(extensions, list):
+        return jsonify({'success': False, 'error': "'extensions' must be a list"}), 400
+    extensions = [info for info in extensions if isinstance(info, dict)]
+    # Missing and null permission fields both mean none
+    permission_lists = []
+    for info in extensions:
+        permissions, host_permissions = info.get('permissions') or [], info.get('hostPermissions') or []
+        if not isinstance(permissions, list) or not isinstance(host_permissions, list):
+            return jsonify({'success': False, 'id': info.get('id'),
+                            'error': "'permissions' and 'hostPermissions' must be lists"}), 400
+        permission_lists.append(permissions + host_permissions)
+    results = ThreatIntelligence.analyze_permissions_batch(permission_lists)
+    return jsonify({'success': True, 'results': [
+        {'id': info.get('id'), 'name': info.get('name'), **result}
+        for info, result in zip(extensions, results)
+    ]})
+
+@app.route('/api/ready')
+def readiness():
+    """Readiness probe: ML scoring is available once the model has been loaded and warmed up"""
+    ready = ml_ready()
+    return jsonify({'ml_ready': ready, 'model_version': get_analyzer().model_version if ready else None}), \
+        200 if ready else 503
+
+@app.route('/api/ml/stats')
+def ml_stats():
+    """Micro-batching histograms of the ML analyzer (batch sizes, queue waits)"""
+    if not ml_ready():
+        return jsonify({'ml_ready': False}), 503
+    return jsonify(get_analyzer().stats())
+
+@app.route('/api/ml/drift', methods=['GET', 'POST'])
+def ml_drift():
+    """
+    PSI of the live feature/confidence histograms against the served model's
+    training sketch. POST {"sketch": ...} merges another worker's live sketch
+    (from GET ?sketch=1) into this one; a sketch with other edges, counts of
+    the wrong shape or counts that aren't whole non-negative numbers gets 400.
+    """
+    if not ml_ready():
+        return jsonify({'ml_ready': False}), 503
+    analyzer = get_analyzer()
+    if analyzer.drift is None:
+        return jsonify({'success': False, 'model_version': analyzer.model_version,
+                        'error': 'model was published without a training sketch'}), 404
+    if request.method == 'POST':
+        try:
+            analyzer.drift.merge((request.json or {})['sketch'])
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f'invalid sketch: {e}'}), 400
+    return jsonify({'success': True, 'model_version': analyzer.model_version,
+                    **analyzer.drift.report(include_sketch=bool(request.args.get('sketch')))})
+
+@app.route('/api/ml/retrain', methods=['GET', 'POST'])
+def ml_retrain():
+    """POST starts a retraining run in the background; GET reports the last run"""
+    if request.method == 'POST':
+        socketio.start_background_task(retraining_job.run_once)
+        return jsonify({'success': True, 'started': True}), 202
+    return jsonify({'success': True, 'last_result': retraining_job.last_result})
+
+@app.route('/api/baselines/stats')
+def baseline_stats():
+    return jsonify(behavior_baselines.stats())
+
+@app.route('/api/ai/queue')
+def ai_queue_stats():
+    """Depth, oldest job age and timings of the AI enrichment queue"""
+    return jsonify(enrichment_queue.stats())
+
+@app.route('/api/cascade/stats')
+def cascade_stats():
+    """Runs, skips by reason, budget and latency of each analysis stage"""
+    return jsonify(analysis_cascade.stats())
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify({**result_cache.stats(), 'llm': llm_cache.stats()})
+
 # Native Messaging Bridge
 def native_message_handler():
     # Binary mode, required for the 4-byte header
@@ -218,11 +507,20 @@ def native_message_handler():
             text_length = struct.unpack('I', text_length_bytes)[0]
             message = json.loads(sys.stdin.buffer.read(text_length).decode('utf-8'))
             
-            if message.get('action') == 'threat':
-                process_security_scan(message['data'])
+            response = {"status": "received"}
+            if message.get('action') == 'threat' and isinstance(message.get('data'), dict):
+                result = process_security_scan(message['data'], message.get('deadline_ms'))
+                if result:
+                    response.update({'id': result['id'], 'partial': result['partial'], 'stages': result['stages']})
+            elif message.get('action') == 'scan_batch' and isinstance(message.get('codes'), list):
+                if len(message['codes']) > BATCH_CONFIG['max_items']:
+                    response = {"status": "error", "error": f"at most {BATCH_CONFIG['max_items']} snippets per batch",
+                                "max_items": BATCH_CONFIG['max_items']}
+                else:
+                    response = {"status": "scanned", **scan_batch(message['codes'])}
             
-            # Send acknowledgement back to Chrome
-            resp = json.dumps({"status": "received"}).encode('utf-8')
+            # Send acknowledgement (or batch results) back to Chrome
+            resp = json.dumps(response).encode('utf-8')
             sys.stdout.buffer.write(struct.pack('I', len(resp)))
             sys.stdout.buffer.write(resp)
             sys.stdout.buffer.flush()
@@ -232,12 +530,27 @@ def native_message_handler():
 
 # Execution Entry Point
 if __name__ == '__main__':
+    # Retraining runs in a spawned process, which re-runs this executable when frozen
+    multiprocessing.freeze_support()
     init_db()
+    warm_up_in_background()
+    conn = get_db_connection()
+    try:
+        print(f"Behavior baselines: {behavior_baselines.load(conn)} restored", file=sys.stderr)
+    finally:
+        release_db_connection(conn)
+    behavior_baselines.start_flushing(get_db_connection, release_db_connection, BASELINE_FLUSH_INTERVAL)
+    if DOMAIN_FEED:
+        print(f"Domain index: {ThreatIntelligence.load_domain_feed(DOMAIN_FEED)} domains", file=sys.stderr)
+    if RULE_PACK_CONFIG['directory']:
+        ThreatIntelligence.watch_rule_packs(**RULE_PACK_CONFIG)
+        print(f"Signatures: {ThreatIntelligence.signature_version}", file=sys.stderr)
     
     if len(sys.argv) > 1 and sys.argv[1] == '--native':
         # Running as the bridge for the Chrome Extension
         native_message_handler()
     else:
         # Running as the Web Dashboard server
+        retraining_job.start()
         print("Starting Dashboard at http://127.0.0.1:5000")
         socketio.run(app, host='127.0.0.1', port=5000, debug=False)
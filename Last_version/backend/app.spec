@@ -1,7 +1,15 @@
 # -*- mode: python ; coding: utf-8 -*-
 from PyInstaller.utils.hooks import collect_all
 
-datas = [('ai.py', '.'), ('ml_analyzer.py', '.'), ('threat_intelligence.py', '.')]
+datas = [('ai.py', '.'), ('ml_analyzer.py', '.'), ('threat_intelligence.py', '.'), ('signature_engine.py', '.'),
+         ('rule_packs.py', '.'), ('domain_index.py', '.'), ('result_cache.py', '.'),
+         ('permission_scoring.py', '.'), ('metrics.py', '.'),
+         ('array_store.py', '.'), ('forest_scorer.py', '.'),
+         ('autoencoder_scorer.py', '.'), ('model_store.py', '.'),
+         ('model_retraining.py', '.'), ('behavior_baselines.py', '.'),
+         ('drift_monitor.py', '.'), ('enrichment_queue.py', '.'),
+         ('llm_cache.py', '.'), ('analysis_cascade.py', '.'),
+         ('deadline.py', '.'), ('scan_pipeline.py', '.')]
 binaries = []
 hiddenimports = ['ai', 'psycopg2', 'engineio.async_drivers.eventlet']
 tmp_ret = collect_all('flask_socketio')
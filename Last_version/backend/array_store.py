@@ -0,0 +1,62 @@
+"""
+NumPy array bundles on disk
+Writes uncompressed .npz files atomically and maps their members straight
+from the file, so exported models load without copying or unpickling
+"""
+
+import os
+import zipfile
+from typing import Dict
+
+import numpy as np
+
+
+def save_arrays(path: str, **arrays):
+    """np.savez to a temporary file, then rename it over path"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_arrays(path: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Read every member of an .npz. With mmap the arrays are read-only np.memmap
+    views into the file (np.load ignores mmap_mode for .npz), so processes
+    loading the same model share its pages. Compressed and object members are
+    read normally.
+    """
+    if not mmap:
+        with np.load(path, allow_pickle=False) as bundle:
+            return {name: bundle[name] for name in bundle.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as bundle, open(path, "rb") as f:
+        for info in bundle.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with bundle.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+
+            # Local file header: 30 fixed bytes, then the name and extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(f)
+            read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, fortran_order, dtype = read_header(f)
+            if dtype.hasobject:
+                raise ValueError(f"{path}: member {name} holds Python objects")
+            if not shape or 0 in shape:
+                # Scalars and empty arrays: nothing worth mapping
+                with bundle.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+            arrays[name] = np.memmap(f.name, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                     order="F" if fortran_order else "C")
+    return arrays
@@ -1,16 +1,19 @@
 """
 Autoencoder for behavioral anomaly detection in browser extensions.
 Learns normal behavioral patterns and detects deviations.
+Keras is imported by the functions that build or load the model, so scoring
+exported weights with CompiledAutoencoder works without TensorFlow.
 """
 
 from pyexpat import model
 import numpy as np
-import keras
-import tensorflow
-from keras import layers
 import joblib
 import os
-from keras.optimizers import Adam
+
+try:
+    from autoencoder_scorer import export_autoencoder
+except ImportError:
+    from .autoencoder_scorer import export_autoencoder
 
 class BehaviorAutoencoder:
     def __init__(self, encoding_dim=8, threshold_percentile=95):
@@ -20,6 +23,14 @@ class BehaviorAutoencoder:
         self.encoder = None
         self.anomaly_threshold = None
         self.scaler = None
+
+    def export_compiled(self, path):
+        """
+        Save weights, scaler and threshold to one .npz for CompiledAutoencoder,
+        which scores without TensorFlow
+        """
+        export_autoencoder(self.model, self.scaler, self.anomaly_threshold, path)
+        return path
 ae = BehaviorAutoencoder()
 
         
@@ -28,6 +39,9 @@ def build_model(self, input_dim):
         Build autoencoder architecture for behavioral data
         Input → Encoder (reduces to encoding_dim) → Decoder → Output
         """
+        import keras
+        from keras import layers
+
         # Encoder
         encoder_input = keras.Input(shape=(input_dim,))
         encoded = layers.Dense(64, activation='relu')(encoder_input)
@@ -118,6 +132,8 @@ def save(self, model_path):
     
 def load(self, model_path):
         """Load trained model and scaler"""
+        import keras
+
         self.model = keras.models.load_model(f"{model_path}/autoencoder.h5")
         self.scaler = joblib.load(f"{model_path}/scaler.pkl")
         self.anomaly_threshold = joblib.load(f"{model_path}/threshold.pkl")
@@ -0,0 +1,100 @@
+"""
+NumPy inference for the behavior autoencoder
+Exports the Dense layer weights, scaler and anomaly threshold of a trained
+BehaviorAutoencoder to one .npz and scores batches without TensorFlow
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from array_store import load_arrays, save_arrays
+except ImportError:
+    from .array_store import load_arrays, save_arrays
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    with np.errstate(over="ignore"):  # exp overflow just saturates to 0
+        return 1 / (1 + np.exp(-x))
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+}
+
+
+def export_autoencoder(model, scaler, anomaly_threshold: float, path: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Flatten a Keras stack of Dense layers: kernel_<i>, bias_<i> and the
+    activation names in layer order, plus the StandardScaler and threshold.
+    Written to path as an .npz when given.
+    """
+    arrays = {}
+    activations = []
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if not weights:
+            continue  # InputLayer
+        activation = layer.get_config().get("activation", "linear")
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Layer {layer.name}: unsupported activation {activation!r}")
+        kernel, bias = weights
+        arrays[f"kernel_{len(activations)}"] = np.asarray(kernel, dtype=np.float32)
+        arrays[f"bias_{len(activations)}"] = np.asarray(bias, dtype=np.float32)
+        activations.append(activation)
+
+    arrays["activations"] = np.array(activations)
+    arrays["scaler_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+    arrays["scaler_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+    arrays["anomaly_threshold"] = np.float64(anomaly_threshold)
+    if path is not None:
+        save_arrays(path, **arrays)
+    return arrays
+
+
+class CompiledAutoencoder:
+    """Forward pass and reconstruction MSE of an exported autoencoder, for batches of rows"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        activations = [str(name) for name in arrays["activations"]]
+        self.layers = [
+            (arrays[f"kernel_{i}"], arrays[f"bias_{i}"], ACTIVATIONS[name])
+            for i, name in enumerate(activations)
+        ]
+        self.scaler_mean = arrays["scaler_mean"]
+        self.scaler_scale = arrays["scaler_scale"]
+        self.anomaly_threshold = float(arrays["anomaly_threshold"])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompiledAutoencoder":
+        return cls(load_arrays(path, mmap=mmap))
+
+    def reconstruction_error(self, behaviors) -> np.ndarray:
+        """Per-row MSE between the scaled input and its reconstruction"""
+        X = (np.atleast_2d(np.asarray(behaviors, dtype=np.float64)) - self.scaler_mean) / self.scaler_scale
+        # float32 like Keras
+        hidden = X.astype(np.float32)
+        for kernel, bias, activation in self.layers:
+            hidden = activation(hidden @ kernel + bias)
+        return np.mean(np.square(X - hidden), axis=1)
+
+    def detect_anomaly_batch(self, behaviors) -> List[Dict]:
+        """BehaviorAutoencoder.detect_anomaly for every row of an (N, features) matrix"""
+        mse = self.reconstruction_error(behaviors)
+        scores = np.minimum(mse / self.anomaly_threshold, 1.0)
+        return [
+            {
+                'anomaly_score': float(score),
+                'reconstruction_error': float(error),
+                'threshold': self.anomaly_threshold,
+                'is_anomalous': bool(error > self.anomaly_threshold)
+            }
+            for score, error in zip(scores, mse)
+        ]
+
+    def detect_anomaly(self, behavior_data) -> Dict:
+        return self.detect_anomaly_batch([behavior_data])[0]
@@ -0,0 +1,262 @@
+"""
+Streaming per-extension behavior baselines
+Keeps an exponentially weighted mean/variance of every feature for each
+extension, scores new events against their own extension's baseline and
+flushes the state to behavioral_patterns in bulk
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+PATTERN_TYPE = "feature_baseline"
+VARIANCE_FLOOR = 1e-6      # keeps constant features from producing infinite z-scores
+
+
+class BehaviorBaselines:
+    """
+    State lives in preallocated float32 arrays with one row per extension
+    (mean, variance, event count, last seen, last score); the only per-extension
+    Python objects are the id -> row entry, kept in least recently seen order,
+    and the row -> id list. Capacity doubles up to max_extensions, after which
+    the least recently seen extension's row is recycled in O(1), so memory
+    stays bounded at roughly max_extensions * (8 * features + 21) bytes of
+    arrays plus the id mapping. A recycled row that wasn't flushed yet is
+    carried to the next flush, and restored if its extension comes back first.
+
+    observe() is O(features): score the event against the current baseline
+    (RMS z-score over the features), then fold it in with West's EWMA update.
+    """
+
+    def __init__(self, feature_count: int, alpha: float = 0.05, threshold: float = 3.0,
+                 warmup: int = 10, capacity: int = 1024, max_extensions: int = 100_000):
+        self.feature_count = feature_count
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.max_extensions = max_extensions
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._ids: List[str] = []
+        # Unflushed state of evicted extensions: id -> (count, mean, var, score, last seen)
+        self._evicted: Dict[str, Tuple] = {}
+        self._allocate(min(capacity, max_extensions))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _allocate(self, capacity: int):
+        old = getattr(self, "mean", None)
+        arrays = {
+            "mean": np.zeros((capacity, self.feature_count), dtype=np.float32),
+            "var": np.zeros((capacity, self.feature_count), dtype=np.float32),
+            "count": np.zeros(capacity, dtype=np.int64),
+            "last_seen": np.zeros(capacity, dtype=np.float64),
+            "score": np.zeros(capacity, dtype=np.float32),
+            "dirty": np.zeros(capacity, dtype=bool),
+        }
+        if old is not None:
+            used = len(self._ids)
+            for name, array in arrays.items():
+                array[:used] = getattr(self, name)[:used]
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def _state(self, row: int) -> Tuple:
+        return (int(self.count[row]), self.mean[row].copy(), self.var[row].copy(),
+                float(self.score[row]), float(self.last_seen[row]))
+
+    def _row_for(self, extension_id: str) -> int:
+        row = self._rows.get(extension_id)
+        if row is not None:
+            self._rows.move_to_end(extension_id)
+            return row
+        if len(self._ids) == len(self.count):
+            if len(self._ids) < self.max_extensions:
+                self._allocate(min(len(self._ids) * 2, self.max_extensions))
+            else:
+                evicted, row = self._rows.popitem(last=False)
+                if self.dirty[row]:
+                    self._evicted[evicted] = self._state(row)
+                self._ids[row] = extension_id
+        if row is None:
+            row = len(self._ids)
+            self._ids.append(extension_id)
+        self._rows[extension_id] = row
+        carried = self._evicted.pop(extension_id, None)
+        if carried is not None:
+            self.count[row], self.mean[row], self.var[row], self.score[row], self.last_seen[row] = carried
+            self.dirty[row] = True
+        else:
+            self.count[row] = 0
+            self.mean[row] = 0
+            self.var[row] = 0
+            self.dirty[row] = False
+        return row
+
+    def observe(self, extension_id: str, features) -> Dict:
+        """Score one event against its extension's baseline, then update the baseline"""
+        x = np.asarray(features, dtype=np.float32)
+        with self._lock:
+            row = self._row_for(extension_id)
+            count = int(self.count[row])
+            if count == 0:
+                self.mean[row] = x
+                score = 0.0
+            else:
+                mean, var = self.mean[row], self.var[row]
+                diff = x - mean
+                score = float(np.sqrt(np.mean(diff * diff / np.maximum(var, VARIANCE_FLOOR))))
+                increment = self.alpha * diff
+                mean += increment
+                var[:] = (1 - self.alpha) * (var + diff * increment)
+            self.count[row] = count + 1
+            self.last_seen[row] = time.time()
+            self.score[row] = score
+            self.dirty[row] = True
+
+        return {
+            "anomaly_score": round(score, 4),
+            "is_anomaly": count >= self.warmup and score > self.threshold,
+            "frequency": count + 1,
+        }
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _values(self, extension_id: str, state: Tuple) -> Tuple:
+        count, mean, var, score, last_seen = state
+        return (
+            extension_id, PATTERN_TYPE, count,
+            json.dumps({"mean": mean.tolist(), "var": var.tolist()}),
+            score, bool(count > self.warmup and score > self.threshold), last_seen,
+        )
+
+    def flush(self, conn) -> int:
+        """
+        Upsert every baseline changed since the last flush into behavioral_patterns
+        with execute_values; returns the number of rows written.
+        behavioral_patterns references extensions(id), so extensions not
+        registered yet are added to extensions first.
+        """
+        from psycopg2.extras import execute_values
+
+        with self._lock:
+            rows = np.flatnonzero(self.dirty[:len(self._ids)])
+            evicted = dict(self._evicted)
+            if not len(rows) and not evicted:
+                return 0
+            self.dirty[rows] = False
+            states = {self._ids[row]: self._state(row) for row in rows}
+            values = [self._values(extension_id, state)
+                      for extension_id, state in {**evicted, **states}.items()]
+
+        cur = conn.cursor()
+        try:
+            execute_values(cur, """
+                INSERT INTO extensions (extension_id, name) VALUES %s
+                ON CONFLICT (extension_id) DO NOTHING
+            """, [(value[0], value[0]) for value in values], page_size=1000)
+            execute_values(cur, """
+                INSERT INTO behavioral_patterns
+                    (extension_id, pattern_type, frequency, data, anomaly_score, is_anomaly, last_occurrence)
+                SELECT e.id, v.pattern_type, v.frequency, v.data::jsonb, v.anomaly_score, v.is_anomaly,
+                       to_timestamp(v.last_seen)
+                FROM (VALUES %s) AS v(extension_id, pattern_type, frequency, data, anomaly_score, is_anomaly, last_seen),
+                     extensions e
+                WHERE e.extension_id = v.extension_id
+                ON CONFLICT (extension_id, pattern_type) DO UPDATE SET
+                    frequency = EXCLUDED.frequency,
+                    data = EXCLUDED.data,
+                    anomaly_score = EXCLUDED.anomaly_score,
+                    is_anomaly = EXCLUDED.is_anomaly,
+                    last_occurrence = EXCLUDED.last_occurrence
+            """, values, page_size=1000)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            with self._lock:
+                # Retry these on the next flush; rows recycled meanwhile are carried like evictions
+                for extension_id, state in states.items():
+                    row = self._rows.get(extension_id)
+                    if row is not None:
+                        self.dirty[row] = True
+                    else:
+                        self._evicted.setdefault(extension_id, state)
+            raise
+        finally:
+            cur.close()
+        with self._lock:
+            # Written; unless the extension came back and took its state over meanwhile
+            for extension_id, state in evicted.items():
+                if self._evicted.get(extension_id) is state:
+                    del self._evicted[extension_id]
+        return len(values)
+
+    def load(self, conn) -> int:
+        """Restore the most recently seen baselines saved by flush(); returns how many"""
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT e.extension_id, b.frequency, b.data, b.anomaly_score, EXTRACT(EPOCH FROM b.last_occurrence)
+                FROM behavioral_patterns b JOIN extensions e ON e.id = b.extension_id
+                WHERE b.pattern_type = %s
+                ORDER BY b.last_occurrence DESC LIMIT %s
+            """, (PATTERN_TYPE, self.max_extensions))
+            saved = cur.fetchall()
+        finally:
+            cur.close()
+
+        loaded = 0
+        with self._lock:
+            for extension_id, frequency, data, score, last_seen in reversed(saved):
+                data = data if isinstance(data, dict) else json.loads(data)
+                if len(data.get("mean", ())) != self.feature_count:
+                    continue  # saved for a different feature set
+                row = self._row_for(extension_id)
+                self.mean[row] = data["mean"]
+                self.var[row] = data["var"]
+                self.count[row] = frequency
+                self.score[row] = score or 0.0
+                self.last_seen[row] = float(last_seen)
+                loaded += 1
+        return loaded
+
+    def start_flushing(self, connect: Callable[[], object], release: Callable[[object], None],
+                       interval: float = 30.0) -> "BehaviorBaselines":
+        """Flush every interval seconds on a daemon thread, with a final flush on stop()"""
+        def flush_once():
+            conn = connect()
+            try:
+                self.flush(conn)
+            except Exception as e:
+                print(f"Baseline flush failed: {e}", file=sys.stderr)
+            finally:
+                release(conn)
+
+        def run():
+            while not self._stop.wait(interval):
+                flush_once()
+            flush_once()
+
+        threading.Thread(target=run, name="baseline-flush", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            used = len(self._ids)
+            return {
+                "extensions": used,
+                "capacity": len(self.count),
+                "max_extensions": self.max_extensions,
+                "pending_flush": int(self.dirty[:used].sum()) + len(self._evicted),
+                "anomalous": int(((self.count[:used] > self.warmup) & (self.score[:used] > self.threshold)).sum()),
+                "state_bytes": sum(getattr(self, name).nbytes
+                                   for name in ("mean", "var", "count", "last_seen", "score", "dirty")),
+            }
@@ -0,0 +1,67 @@
+"""
+Benchmark of AIExecutor against a fresh event loop per request
+Runs prompts against mock_llm_server.py (or NETGUARD_LLM_BASE_URL) one at a
+time and from concurrent threads, the way process_security_scan calls the LLM
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_llm_server import start_mock_server
+
+
+def per_request_loop(prompt: str) -> str:
+    """The old call path: a new loop, and so a new connection pool, for every prompt"""
+    import ai
+
+    async def run():
+        client = ai.make_client()
+        try:
+            return await ai.generate_text(prompt, client)
+        finally:
+            await client.close()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def timed(label: str, requests: int, threads: int, call):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(call, [f"Analyze threat: eval | Severity: high #{i}" for i in range(requests)]))
+    elapsed = time.perf_counter() - started
+    failed = sum(result.startswith("AI analysis unavailable") for result in results)
+    print(f"{label:<22}{threads:>8}{elapsed / requests * 1000:>12.2f}{requests / elapsed:>10.1f}{failed:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="mock server response delay")
+    args = parser.parse_args()
+
+    if 'NETGUARD_LLM_BASE_URL' not in os.environ:
+        server = start_mock_server(latency_ms=args.latency_ms)
+        os.environ['NETGUARD_LLM_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"LLM endpoint: {os.environ['NETGUARD_LLM_BASE_URL']}")
+
+    import ai
+    print(f"{'mode':<22}{'threads':>8}{'ms/req':>12}{'req/s':>10}{'failed':>8}")
+    for threads in (1, args.threads):
+        timed("new loop per request", args.requests, threads, per_request_loop)
+        executor = ai.AIExecutor()
+        timed("AIExecutor", args.requests, threads, executor.generate)
+        executor.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
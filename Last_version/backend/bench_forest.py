@@ -0,0 +1,76 @@
+"""
+Benchmark of the array-backed IsolationForest scorer against sklearn
+Fits the MLThreatAnalyzer forest on its synthetic baseline, exports it to
+.npz and times decision_function for batch sizes 1 to 10k
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from forest_scorer import CompiledIsolationForest, export_forest
+
+
+def synthetic_baseline(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Same normal/malicious mix as MLThreatAnalyzer.train_on_synthetic"""
+    normal = rng.normal([10, 1, 2, 100, 0, 0, 0, 0, 0, 5, 3, 0.3],
+                        [5, 0.5, 1, 50, 0.1, 0.1, 0.1, 0.1, 0.1, 2, 1, 0.1], (n * 4 // 5, 12))
+    malicious = rng.normal([40, 3.5, 5, 300, 0.8, 0.7, 0.6, 0.5, 0.7, 15, 8, 0.6],
+                           [10, 0.5, 2, 100, 0.2, 0.2, 0.2, 0.2, 0.2, 5, 2, 0.15], (n - n * 4 // 5, 12))
+    return np.vstack([normal, malicious])
+
+
+def best_of(repeats: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    scaler = StandardScaler()
+    train = scaler.fit_transform(synthetic_baseline(rng, 1000))
+    model = IsolationForest(n_estimators=args.trees, contamination=0.1, random_state=42).fit(train)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "forest.npz")
+        export_forest(model, path, scaler)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        compiled = CompiledIsolationForest.load(path)
+        load_time = time.perf_counter() - start
+
+        print("=" * 70)
+        print(f"IsolationForest scoring - {args.trees} trees, {len(compiled.feature)} nodes, "
+              f".npz {size / 1024:.0f} KB, mmap load {load_time * 1000:.2f} ms")
+        print("=" * 70)
+        print(f"{'batch':>8}{'sklearn ms':>14}{'compiled ms':>14}{'speedup':>10}{'max |diff|':>14}")
+
+        for batch in (1, 10, 100, 1000, 10000):
+            rows = scaler.transform(synthetic_baseline(rng, batch))
+            expected = model.decision_function(rows)
+            got = compiled.decision_function(rows)
+            sklearn_time = best_of(args.repeats, model.decision_function, rows)
+            compiled_time = best_of(args.repeats, compiled.decision_function, rows)
+            print(f"{batch:>8}{sklearn_time * 1000:>14.3f}{compiled_time * 1000:>14.3f}"
+                  f"{sklearn_time / compiled_time:>9.1f}x{np.max(np.abs(expected - got)):>14.2e}")
+        del compiled
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Adversarial benchmark for ThreatIntelligence.scan_code
+Measures worst-case scan time per MB on single-line bundles built to make
+the ".*" signatures backtrack, in the default and the linear mode
+"""
+
+import argparse
+import sys
+import time
+
+from threat_intelligence import ThreatIntelligence
+
+
+# Each corpus opens with the later tokens of a gap rule, so the literal prefilter
+# lets the rule through, then repeats the rule's start on one line without ever
+# completing it: every start makes the default engine scan to the end of the line.
+ADVERSARIAL_CORPORA = {
+    "function_gap": ("atob(x);", "Function(x);"),
+    "xhr_gap": ("open('POST');", "XMLHttpRequest.open('GET');"),
+    "interval_gap": ("command;", "setInterval(fetch);"),
+    "websocket_gap": ("pool.;", "WebSocket('wss://a');"),
+    "cookie_gap": ("session;", "document.cookie.match(x);"),
+    "storage_gap": ("token;auth;", "localStorage.getItem(sessionStorage.getItem(x));"),
+    "runtime_gap": ("credentials;execute;", "chrome.runtime.sendMessage(chrome.runtime.onMessage);"),
+    "hex_run": ("", "\\x4g"),
+    "bracket_run": ("", "['a']['b'];"),
+    "quote_run": ("", "fetch('https://" + "a" * 64),
+}
+
+
+def build_corpus(prefix: str, unit: str, size: int) -> str:
+    return prefix + (unit * (size // len(unit) + 1))[:size - len(prefix)]
+
+
+def time_scan(code: str, linear: bool) -> float:
+    start = time.perf_counter()
+    ThreatIntelligence.scan_code(code, linear=linear)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-kb", type=int, default=1024,
+                        help="corpus size for the linear mode")
+    parser.add_argument("--default-size-kb", type=int, default=8,
+                        help="corpus size for the default mode (it can be quadratic)")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("Signature scan - adversarial corpus benchmark")
+    print("=" * 70)
+    print(f"{'corpus':<16}{'default ms/MB':>18}{'linear ms/MB':>18}{'speedup':>12}")
+
+    worst_default = worst_linear = 0.0
+    for name, (prefix, unit) in ADVERSARIAL_CORPORA.items():
+        default_code = build_corpus(prefix, unit, args.default_size_kb * 1024)
+        linear_code = build_corpus(prefix, unit, args.size_kb * 1024)
+        default_rate = time_scan(default_code, linear=False) * 1000 / (len(default_code) / 2**20)
+        linear_rate = time_scan(linear_code, linear=True) * 1000 / (len(linear_code) / 2**20)
+        worst_default = max(worst_default, default_rate)
+        worst_linear = max(worst_linear, linear_rate)
+        print(f"{name:<16}{default_rate:>18.1f}{linear_rate:>18.1f}{default_rate / linear_rate:>11.1f}x")
+
+    print("-" * 70)
+    print(f"{'worst case':<16}{worst_default:>18.1f}{worst_linear:>18.1f}")
+    print(f"\nDefault mode measured on {args.default_size_kb} KB; its cost per MB keeps "
+          f"growing with size on these inputs, the linear mode's does not.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,17 @@ Combined ML analyzer using Autoencoder + Isolation Forest
 Provides comprehensive threat detection and anomaly analysis
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from .autoencoder_model import BehaviorAutoencoder
 from .isolation_forest_model import ThreatIsolationForest
+from .autoencoder_scorer import CompiledAutoencoder
+from .forest_scorer import CompiledIsolationForest
+
+# Rows per task when a batch is split across the thread pool
+BATCH_CHUNK_ROWS = 1024
 
 class CombinedMLAnalyzer:
     def __init__(self):
@@ -20,6 +28,10 @@ class CombinedMLAnalyzer:
             'obfuscation_score', 'code_complexity',
             'detection_count', 'threat_score'
         ]
+        # NumPy exports of both models (load_compiled_models), used by analyze_behavior_batch
+        self.compiled_autoencoder = None
+        self.compiled_forest = None
+        self._pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="combined-ml")
     
         def train_models(self, normal_behaviors, threat_behaviors ):
             """
@@ -56,6 +68,85 @@ class CombinedMLAnalyzer:
                 'recommendation': self._get_recommendation(combined_score, ae_result, if_result)
         }
     
+    def analyze_behavior_batch(self, behaviors):
+        """
+        analyze_behavior for every row of an (N, 18) matrix of feature_names vectors.
+        Row chunks of both models are scored concurrently on the thread pool (the
+        matrix products and tree walks run in native code without the GIL), then
+        scores and recommendations are combined for all rows at once.
+        """
+        X = np.asarray(behaviors, dtype=np.float64).reshape(-1, len(self.feature_names))
+        chunks = [X[start:start + BATCH_CHUNK_ROWS] for start in range(0, len(X), BATCH_CHUNK_ROWS)]
+        ae_tasks = [self._pool.submit(self._reconstruction_errors, chunk) for chunk in chunks]
+        if_tasks = [self._pool.submit(self._forest_decisions, chunk) for chunk in chunks]
+
+        mse = np.concatenate([task.result() for task in ae_tasks]) if chunks else np.empty(0)
+        anomaly_scores = np.concatenate([task.result()[0] for task in if_tasks]) if chunks else np.empty(0)
+        decisions = np.concatenate([task.result()[1] for task in if_tasks]) if chunks else np.empty(0)
+
+        threshold = float(self._anomaly_threshold())
+        ae_scores = np.minimum(mse / threshold, 1.0)
+        threat_scores = 1 / (1 + np.exp(anomaly_scores))
+        is_threat = decisions < 0
+        combined = np.minimum(ae_scores * 0.4 + threat_scores * 0.6, 1.0)
+        recommendations = np.select(
+            [(combined > 0.8) & is_threat, combined > 0.8, combined > 0.6, combined > 0.4],
+            ["CRITICAL: Remove extension immediately", "HIGH: Investigate and consider removal",
+             "MEDIUM: Monitor closely", "LOW: Keep under observation"],
+            default="NORMAL: Behavior appears safe"
+        )
+
+        return [
+            {
+                'autoencoder': {
+                    'anomaly_score': float(ae_scores[i]),
+                    'reconstruction_error': float(mse[i]),
+                    'threshold': threshold,
+                    'is_anomalous': bool(mse[i] > threshold)
+                },
+                'isolation_forest': {
+                    'is_threat': bool(is_threat[i]),
+                    'threat_score': float(threat_scores[i]),
+                    'anomaly_score': float(anomaly_scores[i]),
+                    'prediction': -1 if is_threat[i] else 1
+                },
+                'combined_threat_score': float(combined[i]),
+                'recommendation': str(recommendations[i])
+            }
+            for i in range(len(X))
+        ]
+
+    def _reconstruction_errors(self, X):
+        if self.compiled_autoencoder is not None:
+            return self.compiled_autoencoder.reconstruction_error(X)
+        scaled = self.autoencoder.scaler.transform(X)
+        reconstructed = self.autoencoder.model.predict(scaled, verbose=0)
+        return np.mean(np.square(scaled - reconstructed), axis=1)
+
+    def _forest_decisions(self, X):
+        """(score_samples, decision_function) of the isolation forest"""
+        if self.compiled_forest is not None:
+            scores = self.compiled_forest.score_samples(self.compiled_forest.transform(X))
+            return scores, scores - self.compiled_forest.offset
+        model = self.isolation_forest.model
+        scores = model.score_samples(self.isolation_forest.scaler.transform(X))
+        return scores, scores - model.offset_
+
+    def _anomaly_threshold(self):
+        if self.compiled_autoencoder is not None:
+            return self.compiled_autoencoder.anomaly_threshold
+        return self.autoencoder.anomaly_threshold
+
+    def export_compiled_models(self, model_dir):
+        """Export both trained models for load_compiled_models"""
+        self.autoencoder.export_compiled(f"{model_dir}/autoencoder/autoencoder.npz")
+        self.isolation_forest.export_compiled(f"{model_dir}/isolation_forest")
+
+    def load_compiled_models(self, model_dir):
+        """Score batches from the NumPy exports instead of Keras/sklearn"""
+        self.compiled_autoencoder = CompiledAutoencoder.load(f"{model_dir}/autoencoder/autoencoder.npz")
+        self.compiled_forest = CompiledIsolationForest.load(f"{model_dir}/isolation_forest/isolation_forest.npz")
+
     def _combine_scores(self, ae_result, if_result):
         """
         Intelligently combine anomaly and threat scores
@@ -112,6 +112,8 @@ CREATE INDEX idx_threats_severity ON threats(severity);
 CREATE INDEX idx_threats_detected_at ON threats(detected_at);
 CREATE INDEX idx_threats_is_confirmed ON threats(is_confirmed);
 CREATE INDEX idx_behavioral_patterns_extension_id ON behavioral_patterns(extension_id);
+-- One row per extension and pattern type, upserted by the baseline flush
+CREATE UNIQUE INDEX idx_behavioral_patterns_pattern ON behavioral_patterns(extension_id, pattern_type);
 CREATE INDEX idx_behavioral_patterns_is_anomaly ON behavioral_patterns(is_anomaly);
 CREATE INDEX idx_ai_analysis_threat_id ON ai_analysis(threat_id);
 CREATE INDEX idx_statistics_date ON statistics(date);
@@ -0,0 +1,72 @@
+"""
+Request deadlines
+One time limit for the whole analysis of a threat, carved into budgets for the
+stages that run inside it; stages that run out are recorded, not fatal
+"""
+
+import time
+from typing import Dict, Optional
+
+# Stage outcomes reported in a result's "stages"
+OK, CACHED, SKIPPED, TIMED_OUT, FAILED = 'ok', 'cached', 'skipped', 'timed_out', 'failed'
+
+
+class Deadline:
+    """
+    Absolute deadline for one request plus the stage outcomes seen so far.
+
+    shares weighs the stages in the order they run. budget(stage) hands out
+    the stage's share of the time that is left among it and the stages after
+    it, so time an earlier stage didn't use flows to the later ones and the
+    last stage gets whatever remains.
+    """
+
+    def __init__(self, timeout: float, shares: Dict[str, float]):
+        self.timeout = timeout
+        self.shares = dict(shares)
+        self.started = time.monotonic()
+        self.expires = self.started + timeout
+        self.stages: Dict[str, Dict] = {}
+
+    @classmethod
+    def from_ms(cls, deadline_ms, default_ms: float, max_ms: float,
+                shares: Dict[str, float]) -> "Deadline":
+        """Deadline from a client-supplied deadline_ms, capped at max_ms; default_ms if missing or invalid"""
+        try:
+            ms = float(deadline_ms) if deadline_ms is not None else default_ms
+        except (TypeError, ValueError):
+            ms = default_ms
+        if not ms > 0:
+            ms = default_ms
+        return cls(min(ms, max_ms) / 1000, shares)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def budget(self, stage: str) -> float:
+        """Seconds stage may take"""
+        names = list(self.shares)
+        later = sum(self.shares[name] for name in names[names.index(stage):])
+        return self.remaining() * self.shares[stage] / later if later else self.remaining()
+
+    def record(self, stage: str, status: str, started: Optional[float] = None, **detail):
+        """Outcome of stage; started is its time.monotonic() start"""
+        entry = {'status': status, **detail}
+        if started is not None:
+            entry['ms'] = round((time.monotonic() - started) * 1000, 2)
+        self.stages[stage] = entry
+
+    @property
+    def partial(self) -> bool:
+        """Whether a stage timed out or failed, so the result is incomplete"""
+        return any(entry['status'] in (TIMED_OUT, FAILED) for entry in self.stages.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            'deadline_ms': round(self.timeout * 1000, 1),
+            'elapsed_ms': round((time.monotonic() - self.started) * 1000, 2),
+            'stages': self.stages,
+        }
@@ -0,0 +1,90 @@
+"""
+Drift monitoring for the served ML model
+Compares live sketches of the model's input features and output confidence
+with the training-set sketch published alongside the model
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from metrics import FeatureSketch
+except ImportError:
+    from .metrics import FeatureSketch
+
+# Population stability index: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 drifted
+PSI_WARN = 0.1
+PSI_DRIFT = 0.25
+MIN_DRIFT_ROWS = 100       # below this the live histograms are too sparse to compare
+
+FEATURE_NAMES = [
+    'score', 'severity', 'pattern_count', 'code_length', 'eval', 'fetch',
+    'cookie', 'local_storage', 'atob', 'call_density', 'property_density', 'entropy',
+]
+SCORE_NAME = 'confidence'
+
+
+def training_sketch(features, confidences, bins: int = 16) -> Dict:
+    """Sketch of the training features plus the model's confidence on them, for a manifest"""
+    return FeatureSketch.from_data(np.column_stack([features, confidences]), bins).to_dict()
+
+
+class DriftMonitor:
+    """
+    Live FeatureSketch of every scored batch (features and confidence as the
+    last column). observe() adds one bincount per column under a lock and
+    stores no rows; report() turns the counts into PSI against the reference.
+    Sketches from other workers (to_dict of their live sketch) merge in with
+    merge().
+    """
+
+    def __init__(self, reference: FeatureSketch, names: Optional[List[str]] = None):
+        self.reference = reference
+        self.names = names or FEATURE_NAMES + [SCORE_NAME]
+        self.live = reference.empty_like()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_manifest(cls, manifest: Dict) -> Optional["DriftMonitor"]:
+        """Monitor for a model store manifest, or None for models published without a sketch"""
+        sketch = manifest.get('metadata', {}).get('training_sketch')
+        return cls(FeatureSketch.from_dict(sketch)) if sketch else None
+
+    def observe(self, features: np.ndarray, confidences: np.ndarray):
+        rows = np.column_stack([features, confidences])
+        with self._lock:
+            self.live.observe(rows)
+
+    def merge(self, sketch: Dict):
+        other = FeatureSketch.from_dict(sketch)
+        with self._lock:
+            self.live.merge(other)
+
+    def reset(self):
+        with self._lock:
+            self.live = self.reference.empty_like()
+
+    def report(self, include_sketch: bool = False) -> Dict:
+        with self._lock:
+            live = FeatureSketch(self.live.edges, self.live.counts)
+        result = {
+            'rows': live.rows,
+            'reference_rows': self.reference.rows,
+            'thresholds': {'warn': PSI_WARN, 'drift': PSI_DRIFT},
+        }
+        if live.rows >= MIN_DRIFT_ROWS:
+            psi = live.psi(self.reference)
+            by_name = {name: round(float(value), 4) for name, value in zip(self.names, psi)}
+            result.update({
+                'score_psi': by_name.pop(SCORE_NAME),
+                'feature_psi': by_name,
+                'max_feature_psi': max(by_name.values()),
+                'drifted': [name for name, value in zip(self.names, psi) if value > PSI_DRIFT],
+            })
+        else:
+            result['status'] = f'collecting ({live.rows}/{MIN_DRIFT_ROWS} rows)'
+        if include_sketch:
+            result['sketch'] = live.to_dict()
+        return result
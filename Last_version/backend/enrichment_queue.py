@@ -0,0 +1,93 @@
+"""
+Bounded background work queue for AI enrichment
+Threats are stored and announced first; their LLM analysis is produced by a
+small worker pool and written back when it arrives
+"""
+
+import queue
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict
+
+try:
+    from metrics import Histogram
+except ImportError:
+    from .metrics import Histogram
+
+
+class EnrichmentQueue:
+    """
+    Fixed-size FIFO drained by `workers` threads that call handler(job).
+
+    submit() never blocks: when max_size jobs are already waiting it returns
+    False and the caller decides what to record instead, so a slow AI provider
+    backs up this queue rather than the ingest path.
+    """
+
+    def __init__(self, handler: Callable[[Any], None], workers: int = 4, max_size: int = 1000):
+        self.handler = handler
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_size)
+        self.queue_wait_ms = Histogram([10, 100, 1000, 5000, 30000, 120000])
+        self.run_ms = Histogram([100, 500, 1000, 2000, 5000, 10000, 30000])
+        self.counters = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self) -> "EnrichmentQueue":
+        with self._lock:
+            if not self._started:
+                for i in range(self.workers):
+                    threading.Thread(target=self._run, name=f"ai-enrich-{i}", daemon=True).start()
+                self._started = True
+        return self
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def submit(self, job: Any) -> bool:
+        """Queue job for the workers; False when the queue is full"""
+        self.start()
+        try:
+            self._queue.put_nowait((time.monotonic(), job))
+        except queue.Full:
+            self._count('rejected')
+            return False
+        self._count('submitted')
+        return True
+
+    def _run(self):
+        while True:
+            queued_at, job = self._queue.get()
+            started = time.monotonic()
+            self.queue_wait_ms.observe((started - queued_at) * 1000)
+            try:
+                self.handler(job)
+                self._count('completed')
+            except Exception as e:
+                self._count('failed')
+                print(f"AI enrichment error: {e}", file=sys.stderr)
+            finally:
+                self.run_ms.observe((time.monotonic() - started) * 1000)
+                self._queue.task_done()
+
+    def oldest_age_ms(self) -> float:
+        """How long the job at the head of the queue has been waiting"""
+        with self._queue.mutex:
+            oldest = self._queue.queue[0][0] if self._queue.queue else None
+        return round((time.monotonic() - oldest) * 1000, 1) if oldest is not None else 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'depth': self._queue.qsize(),
+            'max_size': self._queue.maxsize,
+            'oldest_age_ms': self.oldest_age_ms(),
+            'workers': self.workers,
+            **counters,
+            'queue_wait_ms': self.queue_wait_ms.to_dict(),
+            'run_ms': self.run_ms.to_dict(),
+        }
@@ -0,0 +1,178 @@
+"""
+Whole-extension package scanner
+Scans every script and page of unpacked extensions or .crx/.zip packages
+across a process pool and merges the hits into one report per extension
+"""
+
+import argparse
+import json
+import os
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    from threat_intelligence import ThreatIntelligence
+except ImportError:
+    from .threat_intelligence import ThreatIntelligence
+
+SCANNED_EXTENSIONS = (".js", ".mjs", ".cjs", ".html", ".htm")
+PACKAGE_EXTENSIONS = (".crx", ".zip")
+
+# (extension path, archive member or None for unpacked files, file path or member name)
+ScanEntry = Tuple[str, Optional[str], str]
+
+
+def list_entries(extension_path: str) -> List[ScanEntry]:
+    """Every script/page of an unpacked extension directory or a .crx/.zip package"""
+    if os.path.isdir(extension_path):
+        entries = []
+        for root, _, files in os.walk(extension_path):
+            for name in sorted(files):
+                if name.lower().endswith(SCANNED_EXTENSIONS):
+                    entries.append((extension_path, None, os.path.join(root, name)))
+        return entries
+
+    # zipfile skips the CRX header in front of the archive on its own
+    with zipfile.ZipFile(extension_path) as package:
+        return [
+            (extension_path, name, name)
+            for name in package.namelist()
+            if name.lower().endswith(SCANNED_EXTENSIONS)
+        ]
+
+
+def read_manifest(extension_path: str) -> Dict:
+    """The parsed manifest.json, or {} when it is missing, unreadable or not a JSON object"""
+    try:
+        if os.path.isdir(extension_path):
+            with open(os.path.join(extension_path, "manifest.json"), "rb") as f:
+                manifest = json.loads(f.read().decode("utf-8-sig"))
+        else:
+            with zipfile.ZipFile(extension_path) as package:
+                manifest = json.loads(package.read("manifest.json").decode("utf-8-sig"))
+    except Exception as e:
+        # Corrupt, encrypted or oddly compressed packages raise more than OSError
+        print(f"Manifest unavailable for {extension_path}: {e}", file=sys.stderr)
+        return {}
+    if not isinstance(manifest, dict):
+        print(f"Manifest of {extension_path} is not a JSON object", file=sys.stderr)
+        return {}
+    return manifest
+
+
+def _scan_entry(entry: ScanEntry) -> Dict:
+    """
+    Pool worker: streams one file through the signature engine. Any failure
+    (unreadable file, encrypted member, unsupported compression, ...) becomes
+    an error result for this file, so it can't abort the rest of the batch.
+    """
+    extension_path, member, name = entry
+    try:
+        if member is None:
+            result = ThreatIntelligence.scan_file(name)
+            name = os.path.relpath(name, extension_path)
+        else:
+            with zipfile.ZipFile(extension_path) as package, package.open(member) as stream:
+                result = ThreatIntelligence.scan_file(stream)
+    except Exception as e:
+        return {"file": name, "error": f"{type(e).__name__}: {e}"}
+    return {"file": name, **result}
+
+
+def _string_list(value) -> List[str]:
+    """Manifest list field as a list of strings (null, non-list values and non-string items dropped)"""
+    return [item for item in value if isinstance(item, str)] if isinstance(value, list) else []
+
+
+def build_report(extension_path: str, manifest: Dict, file_results: List[Dict]) -> Dict:
+    """Merge per-file scan results and the manifest permission analysis"""
+    permissions = _string_list(manifest.get("permissions")) + _string_list(manifest.get("host_permissions"))
+    permission_result = ThreatIntelligence.analyze_permissions(permissions)
+
+    hits = [result for result in file_results if result.get("threat_count")]
+    code_score = sum(result["risk_score"] for result in hits)
+    return {
+        "extension": extension_path,
+        "name": manifest.get("name"),
+        "version": manifest.get("version"),
+        "permissions": permission_result,
+        "files_scanned": sum(1 for result in file_results if "error" not in result),
+        "files": hits,
+        "errors": [result for result in file_results if "error" in result],
+        "threat_count": sum(result["threat_count"] for result in hits),
+        "risk_score": min(code_score + permission_result["risk_score"], 100.0),
+    }
+
+
+def scan_extensions(extension_paths: Sequence[str], max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Scan many extensions at once. Files of all extensions share one process
+    pool (one worker per core by default), so small extensions don't leave
+    cores idle while a large one is being scanned.
+    """
+    # Results are kept per position in extension_paths, so a path listed twice gets two reports
+    entries, owners = [], []
+    file_results: List[List[Dict]] = [[] for _ in extension_paths]
+    for index, extension_path in enumerate(extension_paths):
+        # A corrupt package or a vanished path is reported and the rest of the fleet still scanned
+        try:
+            listed = list_entries(extension_path)
+        except Exception as e:
+            file_results[index].append({"file": None, "error": f"{type(e).__name__}: {e}"})
+            continue
+        entries.extend(listed)
+        owners.extend([index] * len(listed))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for index, result in zip(owners, pool.map(_scan_entry, entries, chunksize=8)):
+            file_results[index].append(result)
+
+    return [
+        build_report(path, read_manifest(path), results)
+        for path, results in zip(extension_paths, file_results)
+    ]
+
+
+def scan_extension(extension_path: str, max_workers: Optional[int] = None) -> Dict:
+    """Scan one unpacked extension directory or .crx/.zip package"""
+    return scan_extensions([extension_path], max_workers)[0]
+
+
+def find_extensions(root: str) -> List[str]:
+    """Packages and unpacked extensions (directories with a manifest.json) directly under root"""
+    found = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if name.lower().endswith(PACKAGE_EXTENSIONS) or os.path.isfile(os.path.join(path, "manifest.json")):
+            found.append(path)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan browser extension packages for threats")
+    parser.add_argument("paths", nargs="+", help="extension directories, .crx/.zip files, "
+                                                  "or folders of them with --fleet")
+    parser.add_argument("--fleet", action="store_true",
+                        help="treat each path as a folder holding many extensions")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: all cores)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    paths = args.paths
+    if args.fleet:
+        paths = [extension for root in args.paths for extension in find_extensions(root)]
+
+    reports = scan_extensions(paths, args.workers)
+    output = json.dumps(reports, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Array-backed IsolationForest scorer
+Flattens a fitted sklearn IsolationForest (and its StandardScaler) into flat
+NumPy arrays saved as one .npz, and scores batches from them without sklearn
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    from array_store import load_arrays, save_arrays
+except ImportError:
+    from .array_store import load_arrays, save_arrays
+
+
+# Rows x trees walked per block by CompiledIsolationForest
+BLOCK_NODES = 16384
+
+
+def average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Expected depth of an unsuccessful BST search among n samples, c(n) in the paper"""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    lengths = np.zeros_like(n_samples)
+    lengths[n_samples == 2] = 1.0
+    larger = n_samples > 2
+    n = n_samples[larger]
+    lengths[larger] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return lengths
+
+
+def export_forest(model, path: Optional[str] = None, scaler=None) -> Dict[str, np.ndarray]:
+    """
+    Flatten a fitted IsolationForest into arrays over all nodes of all trees:
+        feature, threshold, left, right - the split; leaves point at themselves
+        depth       - edges from the tree root
+        path_length - depth + c(training samples in the node), used at leaves
+        roots       - index of each tree's root
+    plus offset_, the score normalizer and, with scaler, the StandardScaler
+    mean/scale. Written to path as an .npz when given.
+    """
+    features, thresholds, lefts, rights, depths, path_lengths, roots = [], [], [], [], [], [], []
+    start = 0
+    subsample = model._max_features != model.n_features_in_
+    for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        count = tree.node_count
+        is_leaf = tree.children_left < 0
+        own = np.arange(start, start + count)
+
+        depth = np.zeros(count, dtype=np.int64)
+        for node in range(count):  # children always come after their parent
+            if not is_leaf[node]:
+                depth[tree.children_left[node]] = depth[tree.children_right[node]] = depth[node] + 1
+
+        feature = np.where(is_leaf, 0, tree.feature)
+        if subsample:
+            feature = np.asarray(estimator_features)[feature]
+        features.append(feature)
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, own, tree.children_left + start))
+        rights.append(np.where(is_leaf, own, tree.children_right + start))
+        depths.append(depth)
+        path_lengths.append(depth + average_path_length(tree.n_node_samples))
+        roots.append(start)
+        start += count
+
+    arrays = {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "depth": np.concatenate(depths).astype(np.int32),
+        "path_length": np.concatenate(path_lengths),
+        "roots": np.array(roots, dtype=np.int32),
+        "offset": np.float64(model.offset_),
+        "denominator": np.float64(len(model.estimators_) * average_path_length([model._max_samples])[0]),
+        "n_features": np.int64(model.n_features_in_),
+    }
+    if scaler is not None:
+        arrays["scaler_mean"] = np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(model.n_features_in_))
+        arrays["scaler_scale"] = np.asarray(scaler.scale_ if scaler.with_std else np.ones(model.n_features_in_))
+    if path is not None:
+        save_arrays(path, **arrays)
+    return arrays
+
+
+class CompiledIsolationForest:
+    """
+    Scores rows from export_forest arrays. All trees are walked for a block of
+    rows at once: one gather/compare/step per tree level over a
+    (rows, n_trees) matrix of current nodes, in blocks small enough to stay
+    in cache. Results equal sklearn's
+    decision_function up to float rounding in the sum over trees (~1e-12).
+    Rows must not contain NaN.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        # Children side by side: the child of node is children[2 * node + went_right]
+        self.children = np.column_stack([arrays["left"], arrays["right"]]).ravel()
+        self.path_length = arrays["path_length"]
+        self.roots = np.asarray(arrays["roots"])
+        self.offset = float(arrays["offset"])
+        self.denominator = float(arrays["denominator"])
+        self.n_features = int(arrays["n_features"])
+        self.max_depth = int(np.max(arrays["depth"])) if len(arrays["depth"]) else 0
+        self.scaler_mean = arrays.get("scaler_mean")
+        self.scaler_scale = arrays.get("scaler_scale")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompiledIsolationForest":
+        return cls(load_arrays(path, mmap=mmap))
+
+    def transform(self, X) -> np.ndarray:
+        """Apply the exported StandardScaler, if any"""
+        X = np.asarray(X, dtype=np.float64)
+        if self.scaler_mean is None:
+            return X
+        return (X - self.scaler_mean) / self.scaler_scale
+
+    def score_samples(self, X) -> np.ndarray:
+        """sklearn's score_samples for already-scaled rows: lower is more anomalous"""
+        # Trees compare float32 inputs to float64 thresholds, as sklearn does
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        depths = np.empty(len(X))
+        block = max(1, BLOCK_NODES // max(len(self.roots), 1))
+        for start in range(0, len(X), block):
+            rows = X[start:start + block]
+            # Row offsets into the flattened block, so one take() reads every split value
+            row_offsets = (np.arange(len(rows)) * self.n_features)[:, None]
+            values = rows.ravel()
+            nodes = np.broadcast_to(self.roots, (len(rows), len(self.roots)))
+            for _ in range(self.max_depth):
+                went_right = values.take(row_offsets + self.feature.take(nodes)) > self.threshold.take(nodes)
+                nodes = self.children.take(nodes * 2 + went_right)
+            depths[start:start + block] = self.path_length.take(nodes).sum(axis=1)
+
+        # A forest fitted on a single sample has a zero denominator; sklearn uses a ratio of 1
+        ratio = depths / self.denominator if self.denominator else np.ones(len(X))
+        return -(2.0 ** -ratio)
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X) -> np.ndarray:
+        return np.where(self.decision_function(X) < 0, -1, 1)
@@ -5,7 +5,6 @@ PyQt6-based interface for deep threat analysis, ML detection, and AI insights
 
 import sys
 import json
-import asyncio
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -20,8 +19,13 @@ from PyQt6.QtGui import QFont, QColor, QIcon, QPixmap
 
 from threat_intelligence import ThreatIntelligence
 from ml_analyzer import get_analyzer
+from analysis_cascade import AnalysisCascade
 import ai
 
+# Skips the AI step when signatures and ML are already decisive
+analysis_cascade = AnalysisCascade()
+AI_TIMEOUT = 30.0  # seconds the analysis waits for the LLM before reporting it unavailable
+
 
 class AnalysisWorker(QThread):
     """Worker thread for long-running threat analysis"""
@@ -40,37 +44,46 @@ class AnalysisWorker(QThread):
             # 1. Threat Intelligence Pattern Matching
             intel = ThreatIntelligence()
             code = self.threat_data.get('code', '')
-            ti_results = intel.scan_code(code)
+            with analysis_cascade.timed('signatures'):
+                ti_results = intel.scan_code(code)
+            domain_hits = intel.scan_urls(code, self.threat_data.get('url'))
             
-            self.progress_update.emit(f"Found {len(ti_results['threats'])} pattern matches")
+            self.progress_update.emit(f"Found {len(ti_results['threats'])} pattern matches, "
+                                      f"{len(domain_hits)} known malicious domains")
             
             # 2. ML Analysis
             self.progress_update.emit("Running ML behavioral analysis...")
             ml_analyzer = get_analyzer()
-            ml_result = ml_analyzer.analyze(self.threat_data)
+            with analysis_cascade.timed('ml'):
+                ml_result = ml_analyzer.analyze(self.threat_data)
             
-            # 3. AI Analysis
-            self.progress_update.emit("Getting AI-powered insights...")
+            # 3. AI Analysis, unless the first two stages already decided
+            skip_reason = analysis_cascade.early_exit(ti_results['risk_score'], ml_result,
+                                                      domain_hits=len(domain_hits))
             prompt = (
                 f"Analyze threat: {self.threat_data.get('type', 'Unknown')}\n"
                 f"Severity: {self.threat_data.get('severity', 'Unknown')}\n"
                 f"Code snippet: {code[:500]}\n"
-                f"Detected patterns: {[t['description'] for t in ti_results['threats']]}\n"
+                f"Detected patterns: {[t['description'] for t in ti_results['threats'] + domain_hits]}\n"
                 f"ML Confidence: {ml_result['confidence']}"
             )
             
-            try:
-                loop = asyncio.new_event_loop()
-                ai_analysis = loop.run_until_complete(ai.generate_text(prompt))
-                loop.close()
-            except Exception as e:
-                ai_analysis = f"AI analysis unavailable: {str(e)}"
+            if skip_reason:
+                ai_analysis = f"AI analysis skipped: {skip_reason}"
+            else:
+                self.progress_update.emit("Getting AI-powered insights...")
+                try:
+                    with analysis_cascade.timed('llm'):
+                        ai_analysis = ai.get_executor().generate(prompt, timeout=AI_TIMEOUT)
+                except Exception as e:
+                    ai_analysis = f"AI analysis unavailable: {str(e)}"
             
             self.progress_update.emit("Analysis complete")
             
             # Compile results
             result = {
                 'threat_intelligence': ti_results,
+                'domain_hits': domain_hits,
                 'ml_analysis': ml_result,
                 'ai_analysis': ai_analysis,
                 'timestamp': datetime.now().isoformat()
@@ -200,6 +213,8 @@ class ThreatAnalysisTab(QWidget):
                 output += f"  • {threat['type']}: {threat['description']} [{threat['severity']}]\n"
         else:
             output += "No known malicious patterns detected.\n"
+        for hit in result['domain_hits']:
+            output += f"  • domain: {hit['description']} [{hit['severity']}]\n"
         
         output += "\n\nML BEHAVIORAL ANALYSIS (Isolation Forest)\n"
         output += "-" * 40 + "\n"
@@ -10,6 +10,11 @@ import numpy as np
 import joblib
 import os
 
+try:
+    from forest_scorer import export_forest
+except ImportError:
+    from .forest_scorer import export_forest
+
 class ThreatIsolationForest:
     def __init__(self, contamination=0.1, n_estimators=100, random_state=42):
         """
@@ -97,3 +102,7 @@ class ThreatIsolationForest:
         """Load trained model and scaler"""
         self.model = joblib.load(f"{model_path}/isolation_forest.pkl")
         self.scaler = joblib.load(f"{model_path}/scaler_if.pkl")
+
+    def export_compiled(self, model_path):
+        """Save model and scaler as arrays for CompiledIsolationForest (loadable without sklearn)"""
+        export_forest(self.model, f"{model_path}/isolation_forest.npz", self.scaler)
@@ -0,0 +1,99 @@
+"""
+LLM response cache with request coalescing
+Threats that would send the LLM the same prompt (after normalization) share
+one answer, and concurrent identical prompts share one in-flight request
+"""
+
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Optional
+
+try:
+    from result_cache import ResultCache
+except ImportError:
+    from .result_cache import ResultCache
+
+CONFIDENCE_BUCKET = 0.1    # ML confidences within the same 0.1 band share an answer
+CODE_PREFIX = 200          # characters of code that go into the prompt
+UNAVAILABLE_PREFIX = "AI analysis unavailable"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def prompt_fingerprint(threat_type: str, severity: str, patterns: Iterable[str], code: str,
+                       confidence: float, bucket: float = CONFIDENCE_BUCKET) -> str:
+    """
+    Hash of what the enrichment prompt is built from: the code prefix with
+    whitespace runs collapsed, the pattern set (order-free), and the ML
+    confidence rounded down to its bucket.
+    """
+    content = json.dumps([
+        threat_type, severity, sorted(set(patterns)),
+        _WHITESPACE.sub(" ", (code or "")[:CODE_PREFIX]).strip(),
+        int(float(confidence) // bucket),
+    ])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    ResultCache of LLM answers (memory LRU in front of SQLite, with a TTL)
+    plus singleflight: the first caller of a key runs generate(), later
+    callers with the same key wait for its Future instead of sending their own
+    request. Failed answers are returned to every waiter but not cached.
+    """
+
+    def __init__(self, store: ResultCache):
+        self.store = store
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"generated": 0, "coalesced": 0}
+
+    def peek(self, key: str, count: bool = True) -> Optional[str]:
+        """Cached answer for key, without generating one; count=False for a repeat lookup"""
+        entry = self.store.get(key, count=count)
+        return entry["text"] if entry is not None else None
+
+    def get_or_generate(self, key: str, generate: Callable[[], str], peeked: bool = False) -> str:
+        """
+        Cached or freshly generated answer for key. peeked: the caller already
+        looked key up with peek(), so this request's lookup isn't counted twice
+        """
+        cached = self.peek(key, count=not peeked)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            # A leader that finished between the peek above and the lock has stored its answer
+            text = self.peek(key, count=False)
+            if text is None:
+                text = generate()
+                with self._lock:
+                    self.counters["generated"] += 1
+                if not text.startswith(UNAVAILABLE_PREFIX):
+                    self.store.put(key, {"text": text})
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.store.stats(), **self.counters, "in_flight": len(self._in_flight)}
@@ -0,0 +1,113 @@
+"""
+Lightweight in-process metrics
+Fixed-bucket histograms for batch sizes, queue waits and latencies, and
+mergeable per-feature sketches for drift monitoring
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Largest count a sketch accepts: every count stays exact in a JSON number
+MAX_SKETCH_COUNT = 2 ** 53
+
+
+class Histogram:
+    """Counts observations into buckets with fixed upper bounds (the last bucket is open-ended)"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds: List[float] = sorted(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            labels = [f"<={bound:g}" for bound in self.bounds] + [f">{self.bounds[-1]:g}"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "mean": round(self.total / self.count, 4) if self.count else 0.0,
+            }
+
+
+class FeatureSketch:
+    """
+    Fixed-bin histograms of every column of a feature matrix, in constant memory.
+    The bin edges come from the training data (from_data) and are shared by all
+    sketches compared with it, so two sketches merge by adding their counts and
+    no rows are kept.
+    """
+
+    def __init__(self, edges: np.ndarray, counts: Optional[np.ndarray] = None):
+        """Raises ValueError unless edges are finite, sorted per column and counts fit them"""
+        # edges: (columns, bins - 1) inner edges; bin i of a column is (edges[i-1], edges[i]]
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if self.edges.ndim != 2 or not np.isfinite(self.edges).all() or (np.diff(self.edges, axis=1) < 0).any():
+            raise ValueError("Sketch edges must be a finite (columns, bins - 1) matrix, sorted per column")
+        columns, inner = self.edges.shape
+        if counts is None:
+            self.counts = np.zeros((columns, inner + 1), dtype=np.int64)
+            return
+        counts = np.asarray(counts, dtype=np.float64)
+        if counts.shape != (columns, inner + 1):
+            raise ValueError(f"Sketch counts must have shape {(columns, inner + 1)}, not {counts.shape}")
+        if not (np.isfinite(counts) & (counts >= 0) & (counts <= MAX_SKETCH_COUNT) & (counts == np.floor(counts))).all():
+            raise ValueError(f"Sketch counts must be whole numbers from 0 to {MAX_SKETCH_COUNT}")
+        self.counts = counts.astype(np.int64)
+
+    @classmethod
+    def from_data(cls, X, bins: int = 16) -> "FeatureSketch":
+        """Sketch of X with equal-frequency bins (quantiles of X per column)"""
+        X = np.asarray(X, dtype=np.float64)
+        edges = np.quantile(X, np.linspace(0, 1, bins + 1)[1:-1], axis=0).T
+        sketch = cls(edges)
+        sketch.observe(X)
+        return sketch
+
+    @property
+    def rows(self) -> int:
+        return int(self.counts[0].sum())
+
+    def observe(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.edges))
+        bins = self.counts.shape[1]
+        for column, (edges, values) in enumerate(zip(self.edges, X.T)):
+            self.counts[column] += np.bincount(np.searchsorted(edges, values), minlength=bins)
+
+    def empty_like(self) -> "FeatureSketch":
+        return FeatureSketch(self.edges)
+
+    def merge(self, other: "FeatureSketch") -> "FeatureSketch":
+        """Add other's counts into this sketch; both must have the same edges"""
+        if other.edges.shape != self.edges.shape or not np.array_equal(other.edges, self.edges):
+            raise ValueError("Sketches with different bin edges cannot be merged")
+        self.counts += other.counts
+        return self
+
+    def psi(self, reference: "FeatureSketch") -> np.ndarray:
+        """Population stability index of each column against reference (0 = same distribution)"""
+        smoothing = 0.5  # keeps empty bins from making the log infinite
+        bins = self.counts.shape[1]
+        expected = (reference.counts + smoothing) / (reference.counts.sum(axis=1, keepdims=True) + smoothing * bins)
+        actual = (self.counts + smoothing) / (self.counts.sum(axis=1, keepdims=True) + smoothing * bins)
+        return np.sum((actual - expected) * np.log(actual / expected), axis=1)
+
+    def to_dict(self) -> Dict:
+        return {"edges": self.edges.tolist(), "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FeatureSketch":
+        """Sketch from to_dict output, e.g. another worker's; ValueError if it isn't a valid one"""
+        if not isinstance(data, dict) or "edges" not in data or "counts" not in data:
+            raise ValueError("Sketch must be an object with edges and counts")
+        return cls(data["edges"], data["counts"])
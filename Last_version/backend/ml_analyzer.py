@@ -1,23 +1,73 @@
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+from concurrent.futures import Future
+import hashlib
 import pickle
 import os
+import queue
+import sys
+import threading
+import time
+
+try:
+    from metrics import Histogram
+    from forest_scorer import export_forest
+    from model_store import ModelStore
+    from drift_monitor import DriftMonitor, training_sketch
+except ImportError:
+    from .metrics import Histogram
+    from .forest_scorer import export_forest
+    from .model_store import ModelStore
+    from .drift_monitor import DriftMonitor, training_sketch
+
+FEATURE_COUNT = 12
+SEVERITY_MAP = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+# Below this length str methods beat the fixed cost of the NumPy calls
+HISTOGRAM_MIN_LENGTH = 512
+
+# Micro-batching of concurrent analyze() calls: a batch is scored once it holds
+# BATCH_MAX_SIZE threats or its first threat has waited BATCH_MAX_WAIT_MS
+BATCH_MAX_SIZE = 64
+BATCH_MAX_WAIT_MS = 2.0
+
+def user_data_dir():
+    """Per-user NetGuard data directory (outside the source tree and a one-file build's temp dir)"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser(os.path.join('~', 'Library', 'Application Support'))
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser(os.path.join('~', '.local', 'share'))
+    return os.path.join(base, 'NetGuard')
+
+# Pre-store pickle of the model, only read to seed an empty store (never written)
+LEGACY_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'threat_model.pkl')
+
+# Versioned model artifacts served by get_analyzer(); accepted retrains must survive restarts
+MODEL_STORE_DIR = os.environ.get('NETGUARD_MODEL_STORE', os.path.join(user_data_dir(), 'models', 'store'))
 
 class MLThreatAnalyzer:
-    def __init__(self):
-        self.scaler = StandardScaler()
+    def __init__(self, scaler=None, model=None, model_version=None):
+        """Uses the given fitted scaler/model (e.g. from a ModelStore), else loads or trains one"""
+        self.scaler = scaler if scaler is not None else StandardScaler()
         # contamination=0.1 means we expect 10% of extensions to be 'weird'
-        self.isolation_forest = IsolationForest(contamination=0.1, random_state=42)
-        self.model_path = 'models/threat_model.pkl'
-        self.load_or_train()
+        self.isolation_forest = model if model is not None else IsolationForest(contamination=0.1, random_state=42)
+        self.model_path = LEGACY_MODEL_PATH
+        self.model_version = model_version
+        # Live input/confidence sketches against the training sketch (set by load_from_store)
+        self.drift = None
+        self.training_sketch = None
+        if model is None:
+            self.load_or_train()
     
     def extract_features(self, threat):
         """
         Converts a JSON threat object into a numerical vector the ML can understand.
         We look at 12 distinct behaviors (features).
         """
-        severity_map = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+        severity_map = SEVERITY_MAP
         code = threat.get('code', '')
         
         # This creates a "fingerprint" of the extension's behavior
@@ -36,14 +86,51 @@ class MLThreatAnalyzer:
             len(set(code)) / max(len(code), 1)                     # Entropy (randomness)
         ]
     
+    def extract_features_batch(self, threats, dtype=np.float32):
+        """
+        extract_features for a list of threats, as a float32 (N, 12) array
+        (or dtype).
+        Long ASCII snippets are reduced to one byte histogram (np.bincount) that
+        gives the length, '(' and '.' counts and the distinct-character ratio
+        and tells which keyword searches can be skipped; other snippets go
+        through extract_features.
+        """
+        features = np.empty((len(threats), FEATURE_COUNT), dtype=dtype)
+        for i, threat in enumerate(threats):
+            code = threat.get('code', '')
+            if len(code) < HISTOGRAM_MIN_LENGTH or not code.isascii():
+                features[i] = self.extract_features(threat)
+                continue
+
+            raw = code.encode('ascii')
+            counts = np.bincount(np.frombuffer(raw, dtype=np.uint8), minlength=128)
+            threat_type = threat.get('type', '')
+            features[i] = (
+                threat.get('score', 0),
+                SEVERITY_MAP.get(threat.get('severity', 'low'), 1),
+                len(threat.get('patterns', [])),
+                len(raw),
+                1 if 'eval' in threat_type else 0,
+                1 if 'fetch' in threat_type else 0,
+                1 if _has_letters(counts, 'cookie', fold=True) and b'cookie' in raw.lower() else 0,
+                1 if _has_letters(counts, 'localStorage') and b'localStorage' in raw else 0,
+                1 if _has_letters(counts, 'atob') and b'atob' in raw else 0,
+                counts[ord('(')],
+                counts[ord('.')],
+                np.count_nonzero(counts) / len(raw),
+            )
+        return features
+
     def load_or_train(self):
         """Ensures the model is ready for use."""
         if os.path.exists(self.model_path):
             try:
                 with open(self.model_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.scaler = data['scaler']
-                    self.isolation_forest = data['model']
+                    raw = f.read()
+                data = pickle.loads(raw)
+                self.scaler = data['scaler']
+                self.isolation_forest = data['model']
+                self.model_version = hashlib.sha256(raw).hexdigest()[:12]
                 print("ML Model loaded successfully.")
             except Exception as e:
                 print(f"Error loading model: {e}. Retraining...")
@@ -54,53 +141,228 @@ class MLThreatAnalyzer:
     def train_on_synthetic(self):
         """Generates baseline data so the model knows what 'normal' looks like."""
         print("Training new ML model on synthetic baseline...")
-        # Normal behaviors: Low permissions, short code, few patterns
-        normal = np.random.normal([10, 1, 2, 100, 0, 0, 0, 0, 0, 5, 3, 0.3], 
-                                   [5, 0.5, 1, 50, 0.1, 0.1, 0.1, 0.1, 0.1, 2, 1, 0.1], 
-                                   (800, 12))
-        
-        # Malicious behaviors: High permissions, long/complex code, heavy patterns
-        malicious = np.random.normal([40, 3.5, 5, 300, 0.8, 0.7, 0.6, 0.5, 0.7, 15, 8, 0.6],
-                                      [10, 0.5, 2, 100, 0.2, 0.2, 0.2, 0.2, 0.2, 5, 2, 0.15],
-                                      (200, 12))
-        
-        data = np.vstack([normal, malicious])
-        self.train(data)
+        self.train(synthetic_training_data())
 
     def train(self, data):
-        """Saves the trained model to disk."""
+        """Fits the model in memory; it is persisted by publishing it to a ModelStore."""
         scaled = self.scaler.fit_transform(data)
         self.isolation_forest.fit(scaled)
+        self.training_sketch = self.sketch_of(data)
         
-        os.makedirs('models', exist_ok=True)
-        with open(self.model_path, 'wb') as f:
-            pickle.dump({'scaler': self.scaler, 'model': self.isolation_forest}, f)
-        print(f"Model saved to {self.model_path}")
+        raw = pickle.dumps({'scaler': self.scaler, 'model': self.isolation_forest})
+        self.model_version = hashlib.sha256(raw).hexdigest()[:12]
     
+    def sketch_of(self, data):
+        """Drift reference for data scored by the current model (see drift_monitor.training_sketch)"""
+        return training_sketch(data, confidences_of(self.isolation_forest.decision_function(self.scaler.transform(data))))
+
+    def export_compiled(self, path='models/threat_model.npz'):
+        """Write the scaler and forest as arrays for CompiledIsolationForest (no sklearn needed to score)"""
+        export_forest(self.isolation_forest, path, self.scaler)
+        return path
+
     def analyze(self, threat):
         """The main entry point: takes a threat and returns a decision."""
-        features = np.array([self.extract_features(threat)])
+        return self.analyze_batch([threat])[0]
+
+    def analyze_batch(self, threats, features=None):
+        """
+        Decisions for many threats from one scaler and one forest pass.
+        features: their extract_features_batch(threats, np.float64) rows, if already extracted
+        """
+        if features is None:
+            features = self.extract_features_batch(threats, dtype=np.float64)
         scaled = self.scaler.transform(features)
         
-        # decision_function gives a raw score: lower means more anomalous
-        raw_score = self.isolation_forest.decision_function(scaled)[0]
-        prediction = self.isolation_forest.predict(scaled)[0]
+        # decision_function gives a raw score: lower means more anomalous.
+        # predict() is -1 exactly where it is negative, so one pass gives both
+        raw_scores = self.isolation_forest.decision_function(scaled)
         
-        # Convert raw score to 0-1 confidence. 
-        # Since lower raw_score = anomaly, we invert it.
-        confidence = 1 / (1 + np.exp(raw_score * 5)) 
+        confidences = confidences_of(raw_scores)
+        if self.drift is not None:
+            self.drift.observe(features, confidences)
         
+        return [
+            {
+                'is_threat': bool(raw_score < 0),
+                'confidence': round(float(confidence), 4),
+                'risk_level': 'critical' if confidence > 0.8 else 'high' if confidence > 0.6 else 'medium' if confidence > 0.3 else 'low'
+            }
+            for raw_score, confidence in zip(raw_scores, confidences)
+        ]
+
+def synthetic_training_data():
+    """The synthetic baseline the first model is trained on: 800 normal and 200 malicious rows"""
+    # Normal behaviors: Low permissions, short code, few patterns
+    normal = np.random.normal([10, 1, 2, 100, 0, 0, 0, 0, 0, 5, 3, 0.3], 
+                               [5, 0.5, 1, 50, 0.1, 0.1, 0.1, 0.1, 0.1, 2, 1, 0.1], 
+                               (800, 12))
+    
+    # Malicious behaviors: High permissions, long/complex code, heavy patterns
+    malicious = np.random.normal([40, 3.5, 5, 300, 0.8, 0.7, 0.6, 0.5, 0.7, 15, 8, 0.6],
+                                  [10, 0.5, 2, 100, 0.2, 0.2, 0.2, 0.2, 0.2, 5, 2, 0.15],
+                                  (200, 12))
+    
+    return np.vstack([normal, malicious])
+
+def confidences_of(raw_scores):
+    """
+    Convert raw decision_function scores to 0-1 confidence.
+    Since lower raw_score = anomaly, we invert it.
+    """
+    return 1 / (1 + np.exp(raw_scores * 5))
+
+def _has_letters(counts, word, fold=False):
+    """Whether the byte histogram holds every character of word (either case with fold)"""
+    if fold:
+        return all(counts[ord(c.lower())] or counts[ord(c.upper())] for c in word)
+    return all(counts[ord(c)] for c in word)
+
+class BatchingAnalyzer:
+    """
+    Queues analyze() calls from concurrent requests and scores them together.
+
+    A single worker thread takes the first waiting threat, collects more until
+    max_size threats are queued or max_wait_ms has passed, and runs one
+    analyze_batch over all of them; each caller blocks only on its own result.
+    Everything else (model_version, train, ...) is the wrapped analyzer's.
+    """
+
+    def __init__(self, analyzer, max_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.analyzer = analyzer
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = Histogram([0.1, 0.5, 1, 2, 5, 10, 50])
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="ml-batcher", daemon=True)
+        self._worker.start()
+
+    def __getattr__(self, name):
+        return getattr(self.analyzer, name)
+
+    def analyze(self, threat, timeout=None):
+        """Score threat in the next batch; TimeoutError if that takes longer than timeout seconds"""
+        return self.analyze_with_features(threat, timeout)[0]
+
+    def analyze_with_features(self, threat, timeout=None):
+        """(decision, feature row) for threat, so callers don't extract the features again"""
+        future = Future()
+        self._queue.put((threat, future, time.perf_counter()))
+        return future.result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, _, queued_at in batch:
+                self.queue_wait_ms.observe((started - queued_at) * 1000)
+            analyzer = self.analyzer
+            # A threat that can't be featurized fails its own caller, not the batch
+            items, rows = [], []
+            for threat, future, _ in batch:
+                try:
+                    rows.append(analyzer.extract_features_batch([threat], dtype=np.float64)[0])
+                except Exception as e:
+                    print(f"ML feature error: {e}", file=sys.stderr)
+                    future.set_exception(e)
+                    continue
+                items.append((threat, future))
+            if not items:
+                continue
+            features = np.array(rows)
+            try:
+                results = analyzer.analyze_batch([threat for threat, _ in items], features)
+            except Exception as e:
+                print(f"ML batch error: {e}, scoring threats one by one", file=sys.stderr)
+                for (threat, future), row in zip(items, features):
+                    try:
+                        future.set_result((analyzer.analyze_batch([threat], row[np.newaxis])[0], row))
+                    except Exception as e:
+                        future.set_exception(e)
+                continue
+            for (_, future), result, row in zip(items, results, features):
+                future.set_result((result, row))
+
+    def stats(self):
         return {
-            'is_threat': bool(prediction == -1),
-            'confidence': round(float(confidence), 4),
-            'risk_level': 'critical' if confidence > 0.8 else 'high' if confidence > 0.6 else 'medium' if confidence > 0.3 else 'low'
+            'batch_size': self.batch_sizes.to_dict(),
+            'queue_wait_ms': self.queue_wait_ms.to_dict(),
+            'queued': self._queue.qsize(),
         }
 
+def load_from_store(store, version=None):
+    """
+    Analyzer for the store's CURRENT model (or version), warmed up. An empty
+    store is first seeded with the legacy pickle or, failing that, the
+    synthetic baseline.
+    """
+    if version is None and store.current_version() is None:
+        seed = MLThreatAnalyzer()
+        if seed.training_sketch is None:
+            # A legacy pickle carries no training data; the synthetic baseline stands in as drift reference
+            seed.training_sketch = seed.sketch_of(synthetic_training_data())
+        store.publish(seed.scaler, seed.isolation_forest, {'source': 'seed', 'legacy_version': seed.model_version,
+                                                           'training_sketch': seed.training_sketch})
+    scaler, model, manifest = store.load(version)
+    analyzer = MLThreatAnalyzer(scaler, model, manifest['version'])
+    # First sklearn call and the first touch of the mapped arrays happen here, not in a request
+    analyzer.analyze_batch([{}])
+    analyzer.drift = DriftMonitor.from_manifest(manifest)
+    return analyzer
+
 # Singleton instance for app.py
 _analyzer = None
+_analyzer_lock = threading.Lock()
+_load_lock = threading.Lock()
+_ready = threading.Event()
 
-def get_analyzer():
+def install_analyzer(analyzer):
+    """Serve analyzer from now on; batches already being scored finish on the old one"""
     global _analyzer
-    if _analyzer is None:
-        _analyzer = MLThreatAnalyzer()
+    with _analyzer_lock:
+        if _analyzer is None:
+            _analyzer = BatchingAnalyzer(analyzer)
+        else:
+            _analyzer.analyzer = analyzer
+    _ready.set()
+
+def is_ready():
+    """Whether get_analyzer() returns immediately"""
+    return _ready.is_set()
+
+def warm_up_in_background(store_dir=MODEL_STORE_DIR):
+    """Load and warm up the served model on a daemon thread; is_ready() turns true when done"""
+    def run():
+        with _load_lock:
+            if _ready.is_set():
+                return
+            try:
+                install_analyzer(load_from_store(ModelStore(store_dir)))
+                print(f"ML model {_analyzer.model_version} ready.", file=sys.stderr)
+            except Exception as e:
+                print(f"ML model warm-up failed: {e}", file=sys.stderr)
+
+    thread = threading.Thread(target=run, name="ml-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def get_analyzer():
+    """The served analyzer; loads it here (or waits for the warm-up thread) if not ready yet"""
+    if not _ready.is_set():
+        with _load_lock:
+            if not _ready.is_set():
+                install_analyzer(load_from_store(ModelStore(MODEL_STORE_DIR)))
     return _analyzer
\ No newline at end of file
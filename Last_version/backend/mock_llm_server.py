@@ -0,0 +1,70 @@
+"""
+Local OpenAI-compatible chat completions server for offline benchmarks
+Answers every POST .../chat/completions with a canned summary after a fixed
+delay, over HTTP/1.1 keep-alive like the real provider
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUMMARY = ("Risk: the extension runs obfuscated code with broad permissions. "
+           "Impact: browsing data and credentials may be exfiltrated. "
+           "Recommendation: disable the extension and review its network activity.")
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.05
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+        payload = json.dumps({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": SUMMARY}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode("utf-8")
+        self.send_response(200 if self.path.endswith("/chat/completions") else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(port: int = 0, latency_ms: float = 50.0) -> ThreadingHTTPServer:
+    """Serve on 127.0.0.1:port (0 picks a free port) from a daemon thread"""
+    handler = type("Handler", (MockLLMHandler,), {"latency": latency_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = start_mock_server(args.port, args.latency_ms)
+    print(f"Mock LLM at http://127.0.0.1:{server.server_address[1]}/v1 "
+          f"(set NETGUARD_LLM_BASE_URL to this)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Online retraining from ml_training_data
+Streams verified rows out of PostgreSQL, refits the scaler and forest in a
+separate process, checks the candidate against the served model on a holdout
+and hot-swaps it into get_analyzer() when it is no worse
+"""
+
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    from drift_monitor import training_sketch
+    from ml_analyzer import FEATURE_COUNT, confidences_of, install_analyzer, load_from_store
+    from model_store import ModelStore
+except ImportError:
+    from .drift_monitor import training_sketch
+    from .ml_analyzer import FEATURE_COUNT, confidences_of, install_analyzer, load_from_store
+    from .model_store import ModelStore
+
+MALICIOUS_LABELS = {"malicious", "threat", "anomaly"}
+FETCH_ROWS = 2000          # rows per round trip of the server-side cursor
+HOLDOUT_EVERY = 5          # every 5th row is held out for validation
+MIN_TRAINING_ROWS = 200
+MAX_REGRESSION = 0.02      # allowed drop in balanced accuracy against the served model
+
+
+def stream_training_rows(db_config: Dict, analyzer, fetch_rows: int = FETCH_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (features, is_malicious) of every verified ml_training_data row.
+    The named cursor keeps the result set on the server, so only fetch_rows
+    rows are held in Python at a time. features is either the 12-value
+    MLThreatAnalyzer vector or a threat object that is run through
+    extract_features_batch.
+    """
+    import psycopg2
+
+    chunks, labels = [], []
+    conn = psycopg2.connect(**db_config)
+    try:
+        with conn.cursor(name="ml_training_stream") as cur:
+            cur.itersize = fetch_rows
+            cur.execute(
+                "SELECT features, label FROM ml_training_data WHERE is_verified ORDER BY created_at, id"
+            )
+            while True:
+                rows = cur.fetchmany(fetch_rows)
+                if not rows:
+                    break
+                vectors = [row for row in rows if isinstance(row[0], list) and len(row[0]) == FEATURE_COUNT]
+                threats = [row for row in rows if isinstance(row[0], dict)]
+                if vectors:
+                    chunks.append(np.array([features for features, _ in vectors], dtype=np.float64))
+                if threats:
+                    chunks.append(analyzer.extract_features_batch([features for features, _ in threats],
+                                                                  dtype=np.float64))
+                labels += [label.lower() in MALICIOUS_LABELS for _, label in vectors + threats]
+    finally:
+        conn.close()
+
+    if not chunks:
+        return np.empty((0, FEATURE_COUNT)), np.empty(0, dtype=bool)
+    return np.vstack(chunks), np.array(labels, dtype=bool)
+
+
+def balanced_accuracy(flagged: np.ndarray, is_malicious: np.ndarray) -> float:
+    """Mean of the detection rate on malicious rows and the pass rate on benign ones"""
+    rates = []
+    if is_malicious.any():
+        rates.append(float(flagged[is_malicious].mean()))
+    if (~is_malicious).any():
+        rates.append(float((~flagged[~is_malicious]).mean()))
+    return sum(rates) / len(rates) if rates else 0.0
+
+
+def retrain(db_config: Dict, store_dir: str, min_rows: int = MIN_TRAINING_ROWS) -> Dict:
+    """
+    Runs in the retraining process: fit a candidate on the training rows and
+    publish it to the store (not as CURRENT) if it validates on the holdout.
+    """
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+
+    store = ModelStore(store_dir)
+    current = load_from_store(store)
+    X, is_malicious = stream_training_rows(db_config, current)
+    if len(X) < min_rows:
+        return {"accepted": False, "reason": f"only {len(X)} verified rows (need {min_rows})"}
+
+    holdout = np.arange(len(X)) % HOLDOUT_EVERY == 0
+    scaler = StandardScaler()
+    model = IsolationForest(contamination=0.1, random_state=42)
+    scaled = scaler.fit_transform(X[~holdout])
+    model.fit(scaled)
+
+    candidate_score = balanced_accuracy(model.decision_function(scaler.transform(X[holdout])) < 0,
+                                        is_malicious[holdout])
+    current_score = balanced_accuracy(
+        current.isolation_forest.decision_function(current.scaler.transform(X[holdout])) < 0,
+        is_malicious[holdout]
+    )
+    result = {
+        "rows": int(len(X)),
+        "holdout_rows": int(holdout.sum()),
+        "candidate_score": round(candidate_score, 4),
+        "current_score": round(current_score, 4),
+        "current_version": current.model_version,
+    }
+    if candidate_score < current_score - MAX_REGRESSION:
+        return {**result, "accepted": False, "reason": "candidate is worse than the served model on the holdout"}
+
+    sketch = training_sketch(X[~holdout], confidences_of(model.decision_function(scaled)))
+    version = store.publish(scaler, model, {"source": "ml_training_data", "training_sketch": sketch, **result},
+                            make_current=False)
+    return {**result, "accepted": True, "version": version}
+
+
+class RetrainingJob:
+    """
+    Periodically retrains in a child process and swaps accepted models in.
+
+    The child is spawned rather than forked so it starts from a clean
+    interpreter (no server threads or monkey-patched sockets). Loading and
+    warming up the new version happens on this job's thread; install_analyzer
+    then swaps it in with one assignment, so scoring never waits on it.
+    """
+
+    def __init__(self, db_config: Dict, store_dir: str, interval: float = 6 * 3600,
+                 min_rows: int = MIN_TRAINING_ROWS):
+        self.db_config = db_config
+        self.store = ModelStore(store_dir)
+        self.interval = interval
+        self.min_rows = min_rows
+        self.last_result: Optional[Dict] = None
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def run_once(self) -> Dict:
+        with self._run_lock:
+            started = time.time()
+            try:
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    result = pool.submit(retrain, self.db_config, self.store.root, self.min_rows).result()
+                if result["accepted"]:
+                    # Verified and warmed up before CURRENT names it, so a broken version is never served
+                    analyzer = load_from_store(self.store, result["version"])
+                    self.store.set_current(result["version"])
+                    install_analyzer(analyzer)
+            except Exception as e:
+                result = {"accepted": False, "reason": f"retraining failed: {e}"}
+            result["duration_s"] = round(time.time() - started, 2)
+            self.last_result = result
+            print(f"ML retraining: {json.dumps(result)}", file=sys.stderr)
+            return result
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def start(self) -> "RetrainingJob":
+        threading.Thread(target=self._loop, name="ml-retraining", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,109 @@
+"""
+Versioned model artifact store
+Each published model is a directory holding an uncompressed joblib artifact
+and a manifest with its checksums; CURRENT names the version being served
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+ARTIFACT_NAME = "model.joblib"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """
+    root/
+        CURRENT                 version currently served
+        <version>/manifest.json version, creation time, metadata, sha256 per file
+        <version>/model.joblib  {"scaler": ..., "model": ...}, uncompressed
+
+    Versions are written to a temporary directory and renamed into place, and
+    CURRENT is replaced atomically, so readers never see a partial model.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT_NAME), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, version: str) -> Dict[str, Any]:
+        with open(os.path.join(self.root, version, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+
+    def publish(self, scaler, model, metadata: Optional[Dict[str, Any]] = None,
+                make_current: bool = True) -> str:
+        """Write a new version; returns its name (creation time + artifact hash)"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f".tmp-{os.getpid()}-{time.time_ns()}")
+        os.makedirs(tmp_dir)
+        try:
+            artifact_path = os.path.join(tmp_dir, ARTIFACT_NAME)
+            # No compression: numpy arrays stay mappable with mmap_mode
+            joblib.dump({"scaler": scaler, "model": model}, artifact_path, compress=0)
+            checksum = file_sha256(artifact_path)
+            version = f"{time.strftime('%Y%m%d%H%M%S')}-{checksum[:12]}"
+            manifest = {
+                "version": version,
+                "created": time.time(),
+                "files": {ARTIFACT_NAME: {"sha256": checksum, "size": os.path.getsize(artifact_path)}},
+                "metadata": metadata or {},
+            }
+            with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_dir, os.path.join(self.root, version))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        if make_current:
+            self.set_current(version)
+        return version
+
+    def set_current(self, version: str):
+        tmp_path = os.path.join(self.root, f"{CURRENT_NAME}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_NAME))
+
+    def verify(self, version: str) -> Dict[str, Any]:
+        """Check every file against the manifest; raises ValueError on a mismatch"""
+        manifest = self.manifest(version)
+        for name, expected in manifest["files"].items():
+            actual = file_sha256(os.path.join(self.root, version, name))
+            if actual != expected["sha256"]:
+                raise ValueError(f"Model {version}: checksum mismatch for {name}")
+        return manifest
+
+    def load(self, version: Optional[str] = None) -> Tuple[Any, Any, Dict[str, Any]]:
+        """
+        (scaler, model, manifest) of version, CURRENT by default. Plain NumPy
+        arrays in the artifact are memory-mapped read-only; sklearn rebuilds
+        the forest's tree node arrays on unpickling, so those are copied.
+        """
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"No model published in {self.root}")
+        manifest = self.verify(version)
+        artifact = joblib.load(os.path.join(self.root, version, ARTIFACT_NAME), mmap_mode="r")
+        return artifact["scaler"], artifact["model"], manifest
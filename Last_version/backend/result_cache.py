@@ -0,0 +1,135 @@
+"""
+Content-hash cache for threat analysis results
+In-memory LRU tier with size-based eviction, backed by an optional SQLite file,
+with an optional time to live
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Expired rows are deleted from the SQLite tier once every this many puts
+PURGE_EVERY_PUTS = 1000
+
+
+class ResultCache:
+    """Caches analysis results by a hash of the threat content and model versions"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, path: Optional[str] = None,
+                 ttl: Optional[float] = None, table: str = "result_cache"):
+        """
+        max_bytes: size budget of the in-memory tier (serialized entry sizes)
+        path: SQLite file for the persistent tier, None keeps the cache in memory only
+        ttl: seconds an entry stays valid, None keeps entries until evicted
+        table: SQLite table, so several caches can share one file
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.table = table
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+            )
+            try:
+                self._db.execute(f"ALTER TABLE {table} ADD COLUMN expires REAL")
+            except sqlite3.OperationalError:
+                pass  # created with the column, or already migrated
+            self._db.commit()
+
+    @staticmethod
+    def key_for(threat: Dict, *versions: str) -> str:
+        """Content hash of (code, type, severity, score) and the signature/model versions"""
+        content = json.dumps([
+            threat.get('code', ''), threat.get('type'), threat.get('severity'),
+            threat.get('score', 0), *versions
+        ])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, count: bool = True) -> Optional[Dict[str, Any]]:
+        """Cached result for key; count=False leaves the hit/miss counters alone (repeat lookups)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                self._forget(key)
+                self.counters["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if count:
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                return json.loads(entry[0])
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, expires FROM {self.table} WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                    (key, now)
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0], row[1] if row[1] is not None else float("inf"))
+                    if count:
+                        self.counters["hits"] += 1
+                        self.counters["disk_hits"] += 1
+                    return json.loads(row[0])
+
+            if count:
+                self.counters["misses"] += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        value = json.dumps(result, default=str)
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._remember(key, value, expires if expires is not None else float("inf"))
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+                    (key, value, expires)
+                )
+                self._puts += 1
+                if self.ttl is not None and self._puts % PURGE_EVERY_PUTS == 0:
+                    self._db.execute(f"DELETE FROM {self.table} WHERE expires <= ?", (time.time(),))
+                self._db.commit()
+
+    def _forget(self, key: str):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(key) + len(old[0])
+
+    def _remember(self, key: str, value: str, expires: float):
+        """Add to the memory tier and evict least recently used entries over budget"""
+        self._forget(key)
+        self._entries[key] = (value, expires)
+        self._bytes += len(key) + len(value)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, (old_value, _) = self._entries.popitem(last=False)
+            self._bytes -= len(old_key) + len(old_value)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": self._db is not None,
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,215 @@
+"""
+External signature rule packs
+Loads versioned JSON/YAML packs, caches their rule analysis on disk and
+watches the pack directory to hot-swap a new SignatureEngine in
+"""
+
+import copy
+import json
+import os
+import re
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import yaml
+except ImportError:  # YAML packs need PyYAML, JSON packs work without it
+    yaml = None
+
+try:
+    from signature_engine import SignatureEngine, check_combinable
+except ImportError:
+    from .signature_engine import SignatureEngine, check_combinable
+
+PACK_SUFFIXES = (".json", ".yaml", ".yml")
+ARTIFACT_SUFFIX = ".analysis.json"
+SEVERITIES = ("critical", "high", "medium", "low")
+
+
+def load_pack(path: str, flags: int = re.IGNORECASE) -> Dict:
+    """
+    Read and validate a rule pack:
+        {"name": ..., "version": ..., "rules": {threat_type: {"patterns": [...],
+         "severity": ..., "description": ...}}}
+    Raises ValueError naming the file and rule when the pack is malformed,
+    including patterns that can't be combined with the other rules (see
+    check_combinable).
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if path.endswith(".json"):
+        pack = json.loads(raw.decode("utf-8"))
+    elif yaml is not None:
+        try:
+            pack = yaml.safe_load(raw)
+        except yaml.YAMLError as e:
+            raise ValueError(f"{path}: {e}") from e
+    else:
+        raise ValueError(f"{path}: PyYAML is required for YAML rule packs")
+
+    if not isinstance(pack, dict) or not isinstance(pack.get("rules"), dict):
+        raise ValueError(f"{path}: a rule pack needs a 'rules' mapping")
+    pack.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    pack["version"] = str(pack.get("version", "0"))
+
+    for threat_type, config in pack["rules"].items():
+        if not isinstance(config, dict):
+            raise ValueError(f"{path}: rule '{threat_type}' must be a mapping")
+        if not isinstance(config.get("patterns"), list) or not config["patterns"]:
+            raise ValueError(f"{path}: rule '{threat_type}' needs a non-empty 'patterns' list")
+        if config.get("severity", "medium") not in SEVERITIES:
+            raise ValueError(f"{path}: rule '{threat_type}' has unknown severity {config['severity']!r}")
+        if not isinstance(config.get("description", ""), str):
+            raise ValueError(f"{path}: rule '{threat_type}' description must be a string")
+        for pattern in config["patterns"]:
+            if not isinstance(pattern, str):
+                raise ValueError(f"{path}: rule '{threat_type}' pattern {pattern!r} must be a string")
+            try:
+                check_combinable(pattern, flags)
+            except re.error as e:
+                raise ValueError(f"{path}: rule '{threat_type}' pattern {pattern!r}: {e}") from e
+    return pack
+
+
+def merge_packs(base: Dict[str, Dict], packs: List[Dict]) -> Dict[str, Dict]:
+    """
+    Layer packs over the built-in signatures. A threat type a pack shares with
+    an earlier layer gets the new patterns appended and the pack's severity and
+    description, if it sets them.
+    """
+    signatures = copy.deepcopy(base)
+    for pack in packs:
+        for threat_type, config in pack["rules"].items():
+            merged = signatures.setdefault(threat_type, {
+                "patterns": [], "severity": "medium", "description": f"{threat_type} detected"
+            })
+            merged["patterns"] += [p for p in config["patterns"] if p not in merged["patterns"]]
+            for key in ("severity", "description"):
+                if key in config:
+                    merged[key] = config[key]
+    return signatures
+
+
+def build_engine(base: Dict[str, Dict], packs: List[Dict], cache_dir: Optional[str] = None,
+                 flags: int = re.IGNORECASE) -> SignatureEngine:
+    """
+    Build the engine for the built-in signatures plus packs. With cache_dir the
+    rule analysis is stored as <digest>.analysis.json and reused on the next start.
+    """
+    signatures = merge_packs(base, packs)
+    label = "+".join(["builtin"] + [f"{pack['name']}@{pack['version']}" for pack in packs])
+    if cache_dir is None:
+        return SignatureEngine(signatures, flags, label=label)
+
+    artifact_path = os.path.join(cache_dir, SignatureEngine.digest_of(signatures, flags) + ARTIFACT_SUFFIX)
+    analysis = read_analysis(artifact_path, len(SignatureEngine.rules_of(signatures)))
+
+    engine = SignatureEngine(signatures, flags, label=label, analysis=analysis)
+    if engine.analysis is not analysis:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(engine.analysis, f)
+        os.replace(tmp_path, artifact_path)
+    return engine
+
+
+def _strings(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def read_analysis(path: str, rule_count: int) -> Optional[Dict]:
+    """
+    A cached SignatureEngine.analyze() result, or None when the file is
+    missing or doesn't have the expected shape for rule_count rules
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            analysis = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not (isinstance(analysis, dict)
+            and isinstance(analysis.get("digest"), str)
+            and isinstance(analysis.get("stream_overlap"), int)
+            and isinstance(analysis.get("clauses"), list) and len(analysis["clauses"]) == rule_count
+            and all(isinstance(clauses, list) and all(_strings(clause) for clause in clauses)
+                    for clauses in analysis["clauses"])
+            and isinstance(analysis.get("linear"), list) and len(analysis["linear"]) == rule_count
+            and all(_strings(segments) and segments for segments in analysis["linear"])):
+        print(f"Ignoring malformed rule analysis cache {path}", file=sys.stderr)
+        return None
+    return analysis
+
+class RulePackWatcher:
+    """Polls a pack directory and installs a freshly built engine when it changes"""
+
+    def __init__(self, directory: str, base: Dict[str, Dict],
+                 install: Callable[[SignatureEngine], None],
+                 poll_interval: float = 5.0, cache_dir: Optional[str] = None):
+        self.directory = directory
+        self.base = base
+        self.install = install
+        self.poll_interval = poll_interval
+        self.cache_dir = cache_dir or os.path.join(directory, ".compiled")
+        self._snapshot: Optional[Tuple] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def pack_paths(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(PACK_SUFFIXES)
+        )
+
+    def snapshot(self) -> Tuple:
+        snapshot = []
+        for path in self.pack_paths():
+            stat = os.stat(path)
+            snapshot.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(snapshot)
+
+    def reload(self, snapshot: Optional[Tuple] = None) -> SignatureEngine:
+        """
+        Build an engine from the current packs and install it. Scans in progress
+        keep the engine they started with, new scans pick up the new one.
+        """
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        packs = [load_pack(path) for path, _, _ in snapshot]
+        engine = build_engine(self.base, packs, self.cache_dir)
+        self.install(engine)
+        self._snapshot = snapshot
+        return engine
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            snapshot = self._snapshot
+            try:
+                snapshot = self.snapshot()
+                if snapshot == self._snapshot:
+                    continue
+                engine = self.reload(snapshot)
+                print(f"Rule packs reloaded: {engine.version} ({len(engine.rules)} rules)",
+                      file=sys.stderr)
+            except (OSError, ValueError) as e:
+                # A broken pack leaves the running engine in place until the packs change again
+                self._snapshot = snapshot
+                print(f"Rule pack reload failed: {e}", file=sys.stderr)
+
+    def start(self) -> "RulePackWatcher":
+        try:
+            self.reload()
+        except (OSError, ValueError) as e:
+            # Serve the built-in signatures and pick the packs up once they are fixed
+            try:
+                self._snapshot = self.snapshot()
+            except OSError:
+                pass
+            print(f"Rule packs not loaded: {e}", file=sys.stderr)
+        self._thread = threading.Thread(target=self._run, name="rule-pack-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
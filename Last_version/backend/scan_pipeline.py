@@ -0,0 +1,222 @@
+"""
+Security scan pipeline
+One threat report through the domain, signature, ML and baseline stages under
+a Deadline, then stored and queued for LLM enrichment. Shared by the web API
+and native messaging; app.py wires in the database, enrichment queue and socket
+"""
+
+import math
+import sys
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from threat_intelligence import ThreatIntelligence
+    from llm_cache import prompt_fingerprint
+    from deadline import Deadline, OK, CACHED, SKIPPED, TIMED_OUT, FAILED
+except ImportError:
+    from .threat_intelligence import ThreatIntelligence
+    from .llm_cache import prompt_fingerprint
+    from .deadline import Deadline, OK, CACHED, SKIPPED, TIMED_OUT, FAILED
+
+# ML verdict reported while the model is still loading at boot
+ML_WARMING_UP = {'is_threat': False, 'confidence': 0.0, 'risk_level': 'unknown', 'model_ready': False}
+# ML verdict reported when scoring timed out or failed
+ML_UNAVAILABLE = {'is_threat': False, 'confidence': 0.0, 'risk_level': 'unknown'}
+# Stored with the threat until the enrichment workers fill in the LLM analysis
+AI_PENDING = 'AI analysis pending'
+# type/severity of reports that don't say
+UNKNOWN = 'unknown'
+
+
+def normalize_threat(data: Dict) -> Dict:
+    """
+    Copy of a threat report with the fields the pipeline reads coerced to their
+    types: code a string ('' when missing or not text), type and severity
+    non-empty strings ('unknown'), score a finite number (0), patterns a list
+    of strings, url and extensionId non-empty strings or None. Other fields
+    pass through.
+    """
+    def text(value, default):
+        return value if isinstance(value, str) and value else default
+
+    score = data.get('score', 0)
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not math.isfinite(score):
+        score = 0
+    patterns = data.get('patterns')
+    return {
+        **data,
+        'code': text(data.get('code'), ''),
+        'type': text(data.get('type'), UNKNOWN),
+        'severity': text(data.get('severity'), UNKNOWN),
+        'score': score,
+        'patterns': [str(pattern) for pattern in patterns] if isinstance(patterns, list) else [],
+        'url': text(data.get('url'), None),
+        'extensionId': text(data.get('extensionId'), None),
+    }
+
+
+class ScanPipeline:
+    """
+    Runs process_security_scan. Only the scan and ML stages are bounded by the
+    deadline; the threat row is written whatever is left of it, so a detected
+    threat is never dropped because the client asked for a short deadline.
+
+    get_analyzer returns the served analyzer, or None while it is loading.
+    save_threat(data, ai_response, ml_result, signature_version, deadline)
+    returns the new row's id or None and records the 'db' stage;
+    enqueue(job) returns False when the enrichment queue is full; emit(result)
+    announces a stored threat.
+    """
+
+    def __init__(self, cascade, result_cache, llm_cache, baselines, deadline_config: Dict,
+                 get_analyzer: Callable[[], Any], save_threat: Callable[..., Optional[Any]],
+                 update_ai_analysis: Callable[[Any, str], None], enqueue: Callable[[Dict], bool],
+                 emit: Callable[[Dict], None]):
+        self.cascade = cascade
+        self.result_cache = result_cache
+        self.llm_cache = llm_cache
+        self.baselines = baselines
+        self.deadline_config = deadline_config
+        self.get_analyzer = get_analyzer
+        self.save_threat = save_threat
+        self.update_ai_analysis = update_ai_analysis
+        self.enqueue = enqueue
+        self.emit = emit
+
+    def scan(self, data: Dict, deadline_ms=None) -> Optional[Dict]:
+        """
+        Analyze and store one threat report; deadline_ms bounds the analysis
+        (see DEADLINE_CONFIG). Stages that time out or fail leave a partial
+        result; None only on an unexpected internal error.
+        """
+        try:
+            data = normalize_threat(data)
+            deadline = Deadline.from_ms(deadline_ms, **self.deadline_config)
+            intel = ThreatIntelligence()
+            # Never load or train a model inside a request
+            ml_analyzer = self.get_analyzer()
+
+            # Blocklisted hosts in the code and in the page URL
+            domain_hits = intel.scan_urls(data['code'], data['url'])
+            listed_hosts = sorted(hit['host'] for hit in domain_hits)
+
+            # Repeated snippets reuse the earlier verdict and AI analysis
+            signature_version = intel.signature_version
+            model_version = ml_analyzer.model_version if ml_analyzer else ''
+            cache_key = self.result_cache.key_for(data, signature_version, model_version or '', *listed_hosts)
+            cached = self.result_cache.get(cache_key) if ml_analyzer else None
+            # The ML stage's feature row, reused for the behavior baseline
+            ml_features = None
+            if cached is not None:
+                data['patterns'] = cached['patterns']
+                ml_result = cached['ml_result']
+                ai_response = cached['ai_analysis']
+                deadline.record('scan', CACHED)
+                deadline.record('ml', CACHED)
+            else:
+                # Scan the code snippet sent by the extension in linear mode, so no single
+                # search can overrun the budget by much; rules left when it runs out are
+                # skipped and the hits so far kept
+                started = time.monotonic()
+                try:
+                    with self.cascade.timed('signatures'):
+                        code_results = intel.scan_code(data['code'], linear=True,
+                                                       time_budget=deadline.budget('scan'))
+                    signature_version = code_results['signature_version']
+                    cut_off = len(code_results['cut_off_rules'])
+                    deadline.record('scan', TIMED_OUT if cut_off else OK, started,
+                                    **({'cut_off_rules': cut_off} if cut_off else {}))
+                except Exception as e:
+                    print(f"Signature Scan Error: {e}", file=sys.stderr)
+                    code_results = {'threats': [], 'risk_score': 0.0}
+                    deadline.record('scan', FAILED, started)
+                # patterns list for AI/DB use
+                signatures_found = [t['description'] for t in code_results['threats']]
+                signatures_found += [hit['description'] for hit in domain_hits]
+                data['patterns'] = signatures_found
+
+                # ML Analysis
+                started = time.monotonic()
+                if ml_analyzer:
+                    try:
+                        with self.cascade.timed('ml'):
+                            ml_result, ml_features = ml_analyzer.analyze_with_features(
+                                data, timeout=deadline.budget('ml'))
+                        deadline.record('ml', OK, started)
+                    except FutureTimeout:
+                        ml_result = {**ML_UNAVAILABLE, 'timed_out': True}
+                        deadline.record('ml', TIMED_OUT, started)
+                    except Exception as e:
+                        print(f"ML Analysis Error: {e}", file=sys.stderr)
+                        ml_result = dict(ML_UNAVAILABLE)
+                        deadline.record('ml', FAILED, started)
+                else:
+                    self.cascade.skip('ml', 'warming up')
+                    ml_result = dict(ML_WARMING_UP)
+                    deadline.record('ml', SKIPPED)
+                # Incomplete verdicts are neither cached nor trusted to skip the LLM
+                cacheable = ml_analyzer is not None and not deadline.partial
+
+                # AI Prompting
+                prompt = (
+                    f"Analyze threat: {data['type']} | Severity: {data['severity']}\n"
+                    f"Code Snippet: {data['code'][:200] or 'N/A'}\n"
+                    f"Patterns: {data['patterns']}\n"
+                    f"ML Confidence: {ml_result['confidence']}"
+                )
+
+                # Decisive signature/ML verdicts skip the LLM. Threats with an equivalent prompt
+                # reuse its answer; otherwise enrich_threat fills it in once the row exists.
+                # A missing ML verdict or a budget skip isn't cached.
+                llm_key = prompt_fingerprint(data['type'], data['severity'], data['patterns'],
+                                             data['code'], ml_result['confidence'])
+                skip_reason = None if deadline.partial else self.cascade.early_exit(
+                    code_results['risk_score'], ml_result, domain_hits=len(domain_hits))
+                ai_response = f"AI analysis skipped: {skip_reason}" if skip_reason else self.llm_cache.peek(llm_key)
+                if ai_response is None:
+                    ai_response = AI_PENDING
+                elif not skip_reason:
+                    self.cascade.skip('llm', 'cached')
+                if ai_response == AI_PENDING and not self.cascade.admit('llm'):
+                    ai_response = "AI analysis skipped: budget"
+                elif cacheable and ai_response != AI_PENDING:
+                    self.result_cache.put(cache_key, {'patterns': signatures_found, 'ml_result': ml_result,
+                                                      'ai_analysis': ai_response})
+                enrichment = {
+                    'prompt': prompt,
+                    'llm_key': llm_key,
+                    'cache_key': cache_key,
+                    'cache_entry': {'patterns': signatures_found, 'ml_result': ml_result} if cacheable else None,
+                }
+
+            # Score against this extension's own history, cached verdict or not
+            baseline = None
+            if ml_analyzer and data['extensionId']:
+                if ml_features is None:
+                    ml_features = ml_analyzer.extract_features_batch([data])[0]
+                baseline = self.baselines.observe(data['extensionId'], ml_features)
+
+            # Save to DB, even past the deadline: what was detected is always recorded
+            threat_id = self.save_threat(data, ai_response, ml_result, signature_version, deadline)
+            if threat_id is None and ai_response == AI_PENDING:
+                ai_response = "AI analysis skipped: not stored"
+            elif ai_response == AI_PENDING and not self.enqueue({'threat_id': threat_id, **enrichment}):
+                ai_response = "AI analysis unavailable: enrichment queue full"
+                self.update_ai_analysis(threat_id, ai_response)
+
+            # Real-time update to dashboard; threat_enriched follows when ai_status is pending
+            result = {'id': threat_id, 'ai_analysis': ai_response,
+                      'ai_status': 'pending' if ai_response == AI_PENDING else
+                                   'skipped' if ai_response.startswith('AI analysis skipped') else 'complete',
+                      'ml_result': ml_result,
+                      'domain_hits': domain_hits, 'signature_version': signature_version,
+                      'baseline': baseline, 'partial': deadline.partial, **deadline.to_dict(), **data}
+            if threat_id is not None:
+                self.emit(result)
+            return result
+
+        except Exception as e:
+            print(f"Analysis Error: {e}", file=sys.stderr)
+            return None
@@ -0,0 +1,496 @@
+"""
+Compiled signature engine for threat intelligence
+Matches every signature rule against a code buffer in one forward scan,
+gated by a literal prefilter so benign code rarely reaches the regexes
+"""
+
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+import time
+from functools import lru_cache
+from typing import IO, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    from re import _parser as sre_parse
+    from re._constants import BRANCH, GROUPREF, GROUPREF_EXISTS, LITERAL, SUBPATTERN
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import BRANCH, GROUPREF, GROUPREF_EXISTS, LITERAL, SUBPATTERN
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional, substring checks are used instead
+    ahocorasick = None
+
+# Shorter literals match too often to be worth gating on
+MIN_LITERAL_LENGTH = 3
+
+# Longest span a ".*" may cover in linear mode when a rule can't be split on it
+LINEAR_WINDOW = 4096
+
+# Default read size for streamed scans
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Extra overlap kept between streamed chunks for lookarounds past a match's end
+LOOKAROUND_MARGIN = 64
+
+# Non-ASCII characters that IGNORECASE treats as equal to an ASCII letter
+_IGNORECASE_FOLDS = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+
+
+def fold_case(code: str) -> str:
+    """Lower-case code so that it contains every ASCII literal IGNORECASE would match"""
+    if code.isascii():
+        return code.lower()
+    return code.translate(_IGNORECASE_FOLDS).lower()
+
+
+def _has_backreference(parsed) -> bool:
+    for op, av in parsed:
+        if op is GROUPREF or op is GROUPREF_EXISTS:
+            return True
+        for item in av if isinstance(av, (tuple, list)) else ():
+            nested = item if isinstance(item, list) else [item]
+            if any(isinstance(sub, sre_parse.SubPattern) and _has_backreference(sub) for sub in nested):
+                return True
+    return False
+
+
+def check_combinable(pattern: str, flags: int = 0):
+    """
+    Raise re.error unless pattern can be one alternative of the combined
+    matcher. Global inline flags like (?i) must start the whole expression,
+    group numbers shift with the rules in front of it and group names may
+    clash, so those and backreferences are rejected.
+    """
+    compiled = re.compile(pattern, flags)
+    re.compile(f"(?:{pattern})(?P<r0>)", flags)
+    if compiled.groupindex:
+        raise re.error("named groups are not supported in signature rules")
+    if _has_backreference(sre_parse.parse(pattern, flags)):
+        raise re.error("backreferences are not supported in signature rules")
+
+
+def required_literals(pattern: str, flags: int = 0) -> Tuple[FrozenSet[str], ...]:
+    """
+    Lower-cased literals that every match of pattern must contain, as clauses:
+    each match contains at least one literal from every clause. No clauses
+    means nothing of MIN_LITERAL_LENGTH can be proven to be required.
+    """
+    return _sequence_clauses(sre_parse.parse(pattern, flags))
+
+
+def _sequence_clauses(items) -> Tuple[FrozenSet[str], ...]:
+    items = list(items)
+    if len(items) == 1:
+        op, av = items[0]
+        if op is BRANCH:
+            # Each alternative contributes its longest literal, any one may occur
+            alternatives = [_sequence_clauses(alt) for alt in av[1]]
+            if not all(alternatives):
+                return ()
+            return (frozenset(
+                max((literal for clause in clauses for literal in clause), key=len)
+                for clauses in alternatives
+            ),)
+        if op is SUBPATTERN:
+            return _sequence_clauses(av[-1])
+
+    # Otherwise every run of consecutive ASCII literals is required
+    runs, run = [], ""
+    for op, av in items:
+        if op is LITERAL and av < 128:
+            run += chr(av).lower()
+        else:
+            runs.append(run)
+            run = ""
+    runs.append(run)
+    return tuple(frozenset([run]) for run in runs if len(run) >= MIN_LITERAL_LENGTH)
+
+
+def _gap_positions(pattern: str) -> Tuple[List[Tuple[int, int, int]], bool]:
+    """
+    Locate the unbounded ".*" / ".+" gaps of pattern outside character classes.
+    Returns (start, end, group depth) for each gap and whether the pattern has
+    a top-level alternation.
+    """
+    gaps, depth, in_class, alternation = [], 0, False, False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            if ch == "]":
+                in_class = False
+        elif ch == "[":
+            in_class = True
+            # A "]" straight after "[" or "[^" is a literal
+            if pattern[i + 1:i + 2] == "^":
+                i += 1
+            if pattern[i + 1:i + 2] == "]":
+                i += 1
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            alternation = True
+        elif ch == "." and pattern[i + 1:i + 2] in ("*", "+"):
+            end = i + 2
+            if pattern[end:end + 1] == "?":
+                end += 1
+            elif pattern[end:end + 1] == "+":
+                # Possessive repeats can't be treated as plain gaps
+                i = end + 1
+                continue
+            gaps.append((i, end, depth))
+            i = end
+            continue
+        i += 1
+    return gaps, alternation
+
+
+def split_gaps(pattern: str, flags: int = 0) -> Optional[List[str]]:
+    """
+    Split pattern on its top-level ".*" gaps into fixed-width segments.
+
+    "A.*B" matches iff some A is followed by B later on the same line, and for
+    fixed-width segments the leftmost match is also the earliest ending one, so
+    the segments can be searched one after another in linear time. Returns
+    None when the pattern can't be split that way.
+    """
+    gaps, alternation = _gap_positions(pattern)
+    if alternation or not gaps or any(depth or pattern[start + 1] != "*" for start, _, depth in gaps):
+        return None
+    # Global inline flags like "(?s)" would only apply to the first segment
+    if re.compile(pattern, flags).flags != re.compile("", flags).flags:
+        return None
+
+    segments, start = [], 0
+    for gap_start, gap_end, _ in gaps:
+        segments.append(pattern[start:gap_start])
+        start = gap_end
+    segments.append(pattern[start:])
+    segments = [segment for segment in segments if segment]
+    for segment in segments:
+        lo, hi = sre_parse.parse(segment, flags).getwidth()
+        if lo != hi or lo == 0:
+            return None
+    return segments
+
+
+def bound_gaps(pattern: str, window: int = LINEAR_WINDOW) -> str:
+    """Rewrite every ".*" / ".+" gap into a bounded ".{0,window}" / ".{1,window}" one"""
+    gaps, _ = _gap_positions(pattern)
+    for start, end, _ in reversed(gaps):
+        low = 0 if pattern[start + 1] == "*" else 1
+        pattern = f"{pattern[:start]}.{{{low},{window}}}{pattern[start + 2:end]}{pattern[end:]}"
+    return pattern
+
+
+def _segments_search(segments: Sequence["re.Pattern"], code: str) -> bool:
+    """True if the segments occur in order on one line of code (linear time)"""
+    first, rest = segments[0], segments[1:]
+    pos = 0
+    while True:
+        match = first.search(code, pos)
+        if match is None:
+            return False
+        end = match.end()
+        for segment in rest:
+            following = segment.search(code, end)
+            if following is None:
+                return False
+            line_break = code.rfind("\n", end, following.start())
+            if line_break != -1:
+                # Nothing on this line can complete the chain, retry from the next segment's line
+                pos = line_break + 1
+                break
+            end = following.end()
+        else:
+            return True
+
+
+def read_text_chunks(source: Union[str, os.PathLike, IO[bytes]],
+                     chunk_size: int = STREAM_CHUNK_SIZE,
+                     encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Decode a file path or binary stream in chunks of chunk_size bytes.
+    Files are memory-mapped; multi-byte characters split across chunks are
+    carried over by an incremental decoder.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for offset in range(0, size, chunk_size):
+                        yield decoder.decode(mapped[offset:offset + chunk_size])
+    else:
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            yield decoder.decode(data)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class LiteralPrefilter:
+    """Finds which rules can possibly match from one multi-literal pass over the code"""
+
+    def __init__(self, rule_clauses: Sequence[Tuple[FrozenSet[str], ...]]):
+        """rule_clauses[i] holds the required literal clauses of rule i (none = always run)"""
+        self.rule_clauses = list(rule_clauses)
+        self.ungated = tuple(i for i, clauses in enumerate(self.rule_clauses) if not clauses)
+        self.rules_for: Dict[str, Tuple[int, ...]] = {}
+        for rule_id, clauses in enumerate(self.rule_clauses):
+            for literal in set().union(*clauses):
+                self.rules_for[literal] = self.rules_for.get(literal, ()) + (rule_id,)
+
+        self.automaton = None
+        if ahocorasick is not None and self.rules_for:
+            self.automaton = ahocorasick.Automaton()
+            for literal in self.rules_for:
+                self.automaton.add_word(literal, literal)
+            self.automaton.make_automaton()
+
+    def found_literals(self, code: str) -> set:
+        folded = fold_case(code)
+        if self.automaton is None:
+            return {literal for literal in self.rules_for if literal in folded}
+
+        found = set()
+        for _, literal in self.automaton.iter(folded):
+            found.add(literal)
+            if len(found) == len(self.rules_for):
+                break
+        return found
+
+    def candidates(self, code: str) -> Tuple[int, ...]:
+        """Ids of the rules whose literal clauses are all satisfied, plus the ungated ones"""
+        found = self.found_literals(code)
+        rule_ids = set(self.ungated)
+        for literal in found:
+            for rule_id in self.rules_for[literal]:
+                if all(clause & found for clause in self.rule_clauses[rule_id]):
+                    rule_ids.add(rule_id)
+        return tuple(sorted(rule_ids))
+
+
+class SignatureEngine:
+    """Combines all signature regexes into a single alternation of named groups"""
+
+    def __init__(self, signatures: Dict[str, Dict], flags: int = re.IGNORECASE,
+                 label: str = "builtin", analysis: Optional[Dict] = None):
+        """
+        signatures: mapping of threat type -> {"patterns": [...], "severity": ..., "description": ...}
+        label: names the rule set (e.g. its packs and their versions) in version
+        analysis: output of analyze() for these signatures, to skip re-parsing them
+        Rules are numbered in dict/list order so results keep the original ordering.
+        """
+        self.signatures = signatures
+        self.flags = flags
+        self.rules = self.rules_of(signatures)
+        # Identifies the rule set in cached and stored verdicts
+        self.digest = self.digest_of(signatures, flags)
+        self.label = label
+        self.version = f"{label}:{self.digest[:12]}"
+
+        if analysis is None or analysis.get("digest") != self.digest:
+            analysis = self.analyze()
+        self.analysis = analysis
+        self.prefilter = LiteralPrefilter([
+            tuple(frozenset(clause) for clause in clauses) for clauses in analysis["clauses"]
+        ])
+        self.linear_sources: List[Tuple[str, ...]] = [tuple(segments) for segments in analysis["linear"]]
+        self.stream_overlap: int = analysis["stream_overlap"]
+
+        # Regexes are compiled on first use, so large rule sets start quickly
+        self._matcher_for = lru_cache(maxsize=256)(self._build_matcher)
+        self._linear_for = lru_cache(maxsize=None)(self._build_linear)
+
+    @staticmethod
+    def rules_of(signatures: Dict[str, Dict]) -> List[Tuple[str, str]]:
+        return [
+            (threat_type, pattern)
+            for threat_type, config in signatures.items()
+            for pattern in config["patterns"]
+        ]
+
+    @classmethod
+    def digest_of(cls, signatures: Dict[str, Dict], flags: int = re.IGNORECASE) -> str:
+        """Hash of the rules and flags, known before anything is parsed or compiled"""
+        return hashlib.sha256(json.dumps([cls.rules_of(signatures), flags]).encode("utf-8")).hexdigest()
+
+    def analyze(self) -> Dict:
+        """
+        Parse every rule once: literal clauses for the prefilter, linear-mode
+        segments and the streaming overlap. The result is plain data that can
+        be stored and passed back as analysis to skip this step.
+        """
+        clauses = [required_literals(pattern, self.flags) for _, pattern in self.rules]
+        linear = []
+        for _, pattern in self.rules:
+            segments = split_gaps(pattern, self.flags)
+            linear.append(segments if segments is not None else [bound_gaps(pattern)])
+
+        widths = [MIN_LITERAL_LENGTH]
+        widths.extend(len(literal) for rule_clauses in clauses for clause in rule_clauses for literal in clause)
+        for segments in linear:
+            for segment in segments:
+                widths.append(min(sre_parse.parse(segment, self.flags).getwidth()[1], LINEAR_WINDOW))
+
+        return {
+            "digest": self.digest,
+            "clauses": [[sorted(clause) for clause in rule_clauses] for rule_clauses in clauses],
+            "linear": linear,
+            "stream_overlap": max(widths) + LOOKAROUND_MARGIN,
+        }
+
+    def _build_linear(self, rule_id: int) -> Tuple["re.Pattern", ...]:
+        """Compiled form of a rule for linear mode: its segments, or one bounded regex"""
+        return tuple(re.compile(segment, self.flags) for segment in self.linear_sources[rule_id])
+
+    def _build_matcher(self, rule_ids: Tuple[int, ...]) -> "re.Pattern":
+        """
+        Compile (?:rule0)(?P<r0>)|(?:rule1)(?P<r1>)|... for the given rule ids.
+
+        The named group is an empty marker placed after each rule rather than
+        around it: a leading group would stop sre from skipping alternatives
+        on their first character, which makes the combined scan ~2x slower.
+        """
+        alternation = "|".join(f"(?:{self.rules[i][1]})(?P<r{i}>)" for i in rule_ids)
+        return re.compile(alternation, self.flags)
+
+    def match_rules(self, code: str, linear: bool = False,
+                    time_budget: Optional[float] = None) -> Tuple[List[int], List[int]]:
+        """
+        Return (matched, cut_off): the ids of every rule that matches somewhere in
+        code and of the rules left unchecked when time_budget (seconds) ran out,
+        both in rule order.
+
+        Only rules whose required literals occur in code are searched for. The
+        combined matcher finds the leftmost position where any remaining rule
+        matches. The winning rule is dropped and the search resumes at the same
+        position, so rules whose matches overlap are still found and the scan
+        position only ever moves forward.
+
+        With linear=True every rule is searched on its own in linear time: ".*"
+        gaps are split into segments searched one after another, and rules that
+        can't be split have their gaps bounded to LINEAR_WINDOW characters.
+        The default mode has no time guarantee: a single backtracking search
+        can run far longer than any budget, so a time_budget implies linear
+        mode. The budget is checked between rule searches, each of which is
+        linear in len(code).
+        """
+        remaining = self.prefilter.candidates(code)
+        if linear or time_budget is not None:
+            deadline = None if time_budget is None else time.perf_counter() + time_budget
+            return self._match_linear(code, remaining, deadline)
+
+        matched = []
+        pos = 0
+        while remaining:
+            match = self._matcher_for(remaining).search(code, pos)
+            if match is None:
+                break
+            rule_id = int(match.lastgroup[1:])
+            matched.append(rule_id)
+            remaining = tuple(i for i in remaining if i != rule_id)
+            pos = match.start()
+        return sorted(matched), []
+
+    def _match_linear(self, code: str, rule_ids: Tuple[int, ...],
+                      deadline: Optional[float]) -> Tuple[List[int], List[int]]:
+        matched = []
+        for n, rule_id in enumerate(rule_ids):
+            if deadline is not None and time.perf_counter() > deadline:
+                return matched, list(rule_ids[n:])
+            segments = self._linear_for(rule_id)
+            if len(segments) == 1:
+                found = segments[0].search(code) is not None
+            else:
+                found = _segments_search(segments, code)
+            if found:
+                matched.append(rule_id)
+        return matched, []
+
+    def match_stream(self, chunks: Iterable[str]) -> List[int]:
+        """
+        Return the ids of every rule that matches text delivered in chunks, in rule order.
+
+        Rules are searched as in linear mode. Split gap rules keep their progress
+        from chunk to chunk, so their pieces may be any distance apart. Each chunk
+        is searched together with the last stream_overlap characters of the
+        previous one, and a match is only taken once it starts before that
+        overlap, so matches crossing a boundary are found in the next buffer.
+        Non-gap matches longer than LINEAR_WINDOW can be missed on a boundary.
+        """
+        matched = set()
+        gap_rules = {i: [0, 0] for i, segments in enumerate(self.linear_sources) if len(segments) > 1}
+        tail, base = "", 0
+        chunks = iter(chunks)
+        chunk = next(chunks, None)
+        while chunk is not None:
+            following = next(chunks, None)
+            buf = tail + chunk
+            final = following is None
+            owned_end = len(buf) if final else max(len(buf) - self.stream_overlap, 0)
+
+            for rule_id in self.prefilter.candidates(buf):
+                if rule_id in matched or rule_id in gap_rules:
+                    continue
+                found = self._linear_for(rule_id)[0].search(buf)
+                if found is not None and found.start() < owned_end:
+                    matched.add(rule_id)
+
+            for rule_id, progress in list(gap_rules.items()):
+                if self._advance_gap_rule(self._linear_for(rule_id), progress, buf, base, owned_end, final):
+                    matched.add(rule_id)
+                    del gap_rules[rule_id]
+
+            tail = buf[owned_end:]
+            base += owned_end
+            chunk = following
+        return sorted(matched)
+
+    @staticmethod
+    def _advance_gap_rule(segments: Sequence["re.Pattern"], progress: List[int], buf: str,
+                          base: int, owned_end: int, final: bool) -> bool:
+        """
+        Stream counterpart of _segments_search. progress holds the next segment
+        to find and the global position it may start at; returns True once the
+        last segment has been found.
+        """
+        while True:
+            stage, start = progress
+            local = max(start - base, 0)
+            found = segments[stage].search(buf, local)
+            if found is None or found.start() >= owned_end:
+                if stage == 0:
+                    progress[1] = max(start, base + owned_end)
+                else:
+                    line_break = buf.rfind("\n", local, owned_end)
+                    if line_break != -1:
+                        # The chain can't continue past this line, start over on the next one
+                        progress[:] = [0, base + line_break + 1]
+                        continue
+                return False
+
+            if stage:
+                line_break = buf.rfind("\n", local, found.start())
+                if line_break != -1:
+                    progress[:] = [0, base + line_break + 1]
+                    continue
+            if stage == len(segments) - 1:
+                return True
+            progress[:] = [stage + 1, base + found.end()]
@@ -0,0 +1,20 @@
+from analysis_cascade import AnalysisCascade
+
+QUIET_ML = {'is_threat': False, 'confidence': 0.05, 'risk_level': 'low', 'model_ready': True}
+
+
+def test_benign_exit_without_any_hits():
+    cascade = AnalysisCascade()
+    assert cascade.early_exit(0.0, QUIET_ML) == 'clearly benign'
+
+
+def test_blocklisted_host_blocks_benign_exit():
+    cascade = AnalysisCascade()
+    assert cascade.verdict(0.0, QUIET_ML, domain_hits=1) is None
+    assert cascade.early_exit(0.0, QUIET_ML, domain_hits=1) is None
+    assert cascade.stats()['llm']['skipped'] == {}
+
+
+def test_warming_model_never_exits_early():
+    cascade = AnalysisCascade()
+    assert cascade.verdict(0.0, {**QUIET_ML, 'model_ready': False}) is None
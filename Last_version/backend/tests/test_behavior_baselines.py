@@ -0,0 +1,28 @@
+from behavior_baselines import BehaviorBaselines
+
+
+def test_evicts_least_recently_seen_and_carries_unflushed_state():
+    baselines = BehaviorBaselines(2, capacity=2, max_extensions=2)
+    for _ in range(3):
+        baselines.observe('b', [1.0, 2.0])
+    baselines.observe('a', [0.0, 0.0])
+    baselines.observe('b', [1.0, 2.0])
+    baselines.observe('c', [5.0, 5.0])  # recycles a's row, b was seen after a
+
+    assert set(baselines._rows) == {'b', 'c'}
+    assert baselines.stats()['pending_flush'] == 3
+
+    result = baselines.observe('a', [0.0, 0.0])  # back before a flush: its baseline is restored
+    assert result['frequency'] == 2
+    assert set(baselines._rows) == {'a', 'c'}
+    assert 'b' in baselines._evicted and baselines._evicted['b'][0] == 4
+
+
+def test_recycled_clean_row_starts_fresh():
+    baselines = BehaviorBaselines(1, capacity=1, max_extensions=1)
+    baselines.observe('a', [1.0])
+    baselines.dirty[:] = False  # as after a flush
+    baselines.observe('b', [3.0])
+
+    assert baselines._evicted == {}
+    assert baselines.observe('a', [1.0])['frequency'] == 1
@@ -0,0 +1,112 @@
+import time
+
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from analysis_cascade import AnalysisCascade
+from behavior_baselines import BehaviorBaselines
+from deadline import FAILED, OK, SKIPPED, TIMED_OUT, Deadline
+from llm_cache import LLMCache
+from ml_analyzer import FEATURE_COUNT, BatchingAnalyzer, MLThreatAnalyzer, synthetic_training_data
+from result_cache import ResultCache
+from scan_pipeline import AI_PENDING, ScanPipeline
+
+DEADLINE_CONFIG = {'default_ms': 10000, 'max_ms': 60000, 'shares': {'scan': 0.6, 'ml': 0.4}}
+
+# Every line holds the literals of many rules in an order that never completes a match,
+# so each candidate rule has to search the whole snippet
+ADVERSARIAL_LINE = (
+    "command fetch setInterval; open('POST' XMLHttpRequest; token localStorage.getItem; "
+    "auth sessionStorage.getItem; session match document.cookie; execute chrome.runtime.onMessage; "
+    "credentials chrome.runtime.sendMessage; password chrome.cookies.get; atob( Function(; "
+    "pool. wss:// WebSocket\n"
+)
+
+
+class Stubs:
+    """Database, enrichment queue and socket of process_security_scan"""
+
+    def __init__(self):
+        self.saved, self.queued, self.emitted = [], [], []
+
+    def save_threat(self, data, ai_response, ml_result, signature_version, deadline):
+        self.saved.append(dict(data))
+        deadline.record('db', OK)
+        return len(self.saved)
+
+    def enqueue(self, job):
+        self.queued.append(job)
+        return True
+
+
+def pipeline(stubs, analyzer=None):
+    return ScanPipeline(
+        AnalysisCascade(), ResultCache(), LLMCache(ResultCache()), BehaviorBaselines(FEATURE_COUNT),
+        DEADLINE_CONFIG, get_analyzer=lambda: analyzer, save_threat=stubs.save_threat,
+        update_ai_analysis=lambda threat_id, ai_response: None, enqueue=stubs.enqueue,
+        emit=stubs.emitted.append,
+    )
+
+
+def served_analyzer():
+    data = synthetic_training_data()
+    scaler = StandardScaler().fit(data)
+    model = IsolationForest(n_estimators=20, random_state=42).fit(scaler.transform(data))
+    return BatchingAnalyzer(MLThreatAnalyzer(scaler, model, 'test'))
+
+
+def test_budgets_share_the_remaining_time():
+    deadline = Deadline.from_ms(None, **DEADLINE_CONFIG)
+    assert abs(deadline.budget('scan') - 6.0) < 0.05
+    assert abs(deadline.budget('ml') - deadline.remaining()) < 0.05
+    assert Deadline.from_ms('soon', 10000, 60000, DEADLINE_CONFIG['shares']).timeout == 10.0
+    assert Deadline.from_ms(10 ** 9, 10000, 60000, DEADLINE_CONFIG['shares']).timeout == 60.0
+
+
+def test_adversarial_snippet_is_cut_off_but_still_stored():
+    stubs = Stubs()
+    code = ADVERSARIAL_LINE * (4 * 2 ** 20 // len(ADVERSARIAL_LINE))
+
+    started = time.monotonic()
+    result = pipeline(stubs).scan({'type': 'fetch', 'severity': 'high', 'code': code}, deadline_ms=20)
+
+    assert time.monotonic() - started < 1.0
+    assert result['stages']['scan']['status'] == TIMED_OUT
+    assert result['stages']['scan']['cut_off_rules']
+    assert result['partial']
+    assert result['id'] == 1 and len(stubs.saved) == 1
+    assert stubs.emitted == [result]
+
+
+def test_threat_is_stored_after_the_deadline_ran_out():
+    stubs = Stubs()
+    result = pipeline(stubs).scan({'type': 'eval', 'severity': 'high', 'code': "eval(atob('ZXZpbA=='))",
+                                   'url': 'https://example.com'}, deadline_ms=1e-6)
+
+    assert result['id'] == 1
+    assert result['stages']['db']['status'] == OK
+    assert stubs.saved[0]['code'] == "eval(atob('ZXZpbA=='))"
+
+
+def test_small_snippet_completes_within_budget():
+    stubs = Stubs()
+    result = pipeline(stubs).scan({'type': 'eval', 'severity': 'high', 'code': "eval(atob('ZXZpbA=='))"})
+
+    assert result['stages']['scan']['status'] == OK
+    assert result['stages']['ml']['status'] == SKIPPED
+    assert not result['partial']
+    assert result['patterns'] and result['ai_status'] == 'pending'
+    assert stubs.queued[0]['threat_id'] == 1 and result['ai_analysis'] == AI_PENDING
+
+
+def test_malformed_report_is_coerced_and_stored():
+    stubs = Stubs()
+    result = pipeline(stubs, served_analyzer()).scan(
+        {'code': None, 'type': None, 'score': 'high', 'patterns': 'eval', 'extensionId': 7})
+
+    assert result is not None
+    assert result['stages']['ml']['status'] == OK
+    assert all(stage['status'] != FAILED for stage in result['stages'].values())
+    saved = stubs.saved[0]
+    assert (saved['code'], saved['type'], saved['severity'], saved['score']) == ('', 'unknown', 'unknown', 0)
+    assert saved['extensionId'] is None
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from drift_monitor import DriftMonitor
+from metrics import FeatureSketch
+
+
+def reference():
+    rng = np.random.default_rng(0)
+    return FeatureSketch.from_data(rng.normal(size=(500, 3)), bins=4)
+
+
+def test_merges_a_valid_worker_sketch():
+    monitor = DriftMonitor(reference(), names=['a', 'b', 'confidence'])
+    other = reference().empty_like()
+    other.observe(np.zeros((7, 3)))
+    monitor.merge(other.to_dict())
+    assert monitor.report()['rows'] == 7
+
+
+@pytest.mark.parametrize('mangle', [
+    lambda sketch: {**sketch, 'counts': sketch['counts'][:2]},
+    lambda sketch: {**sketch, 'counts': [row[:3] for row in sketch['counts']]},
+    lambda sketch: {**sketch, 'counts': [[-1] * 4] * 3},
+    lambda sketch: {**sketch, 'counts': [[float('nan')] * 4] * 3},
+    lambda sketch: {**sketch, 'counts': [[1e300] * 4] * 3},
+    lambda sketch: {**sketch, 'counts': [[0.5] * 4] * 3},
+    lambda sketch: {**sketch, 'edges': [[0, 1, float('inf')]] * 3},
+    lambda sketch: {**sketch, 'edges': [[0, 1, 2]] * 3},
+    lambda sketch: {'counts': sketch['counts']},
+    lambda sketch: [sketch],
+])
+def test_rejects_malformed_sketches(mangle):
+    monitor = DriftMonitor(reference(), names=['a', 'b', 'confidence'])
+    with pytest.raises(ValueError):
+        monitor.merge(mangle(reference().to_dict()))
+    assert monitor.report()['rows'] == 0
@@ -0,0 +1,61 @@
+import json
+import zipfile
+
+from extension_scanner import scan_extensions
+
+
+def write_package(path, manifest, files):
+    with zipfile.ZipFile(path, "w") as package:
+        package.writestr("manifest.json", json.dumps(manifest))
+        for name, content in files.items():
+            package.writestr(name, content)
+    return str(path)
+
+
+def mark_encrypted(path, member):
+    """Set the 'encrypted' flag of member in the central directory, as a password-protected zip has"""
+    data = bytearray(open(path, "rb").read())
+    start = 0
+    while True:
+        start = data.index(b"PK\x01\x02", start)
+        name_length = int.from_bytes(data[start + 28:start + 30], "little")
+        if data[start + 46:start + 46 + name_length] == member.encode():
+            data[start + 8] |= 0x1
+            break
+        start += 4
+    open(path, "wb").write(bytes(data))
+
+
+def test_corrupt_package_does_not_abort_fleet(tmp_path):
+    good = write_package(tmp_path / "good.zip", {"name": "Good", "version": "1.0", "permissions": []},
+                         {"background.js": "eval(atob(payload));"})
+    corrupt = tmp_path / "corrupt.crx"
+    corrupt.write_bytes(b"Cr24 not a zip archive")
+    missing = tmp_path / "missing.zip"
+
+    reports = scan_extensions([str(corrupt), good, str(missing)], max_workers=1)
+
+    assert [report["extension"] for report in reports] == [str(corrupt), good, str(missing)]
+    assert reports[0]["errors"] and reports[0]["files_scanned"] == 0
+    assert reports[2]["errors"] and reports[2]["files_scanned"] == 0
+    assert reports[1]["errors"] == []
+    assert reports[1]["files_scanned"] == 1
+
+
+def test_malformed_manifests_and_encrypted_members(tmp_path):
+    nulls = write_package(tmp_path / "nulls.zip", {"name": "Nulls", "permissions": None, "host_permissions": None},
+                          {"a.js": "eval(atob(x));"})
+    array = write_package(tmp_path / "array.zip", ["not", "an", "object"], {"a.js": "var x = 1;"})
+    encrypted = write_package(tmp_path / "encrypted.zip", {"name": "Enc"},
+                              {"secret.js": "var y = 2;", "plain.js": "eval(atob(z));"})
+    mark_encrypted(encrypted, "secret.js")
+
+    reports = scan_extensions([nulls, array, encrypted, nulls], max_workers=1)
+
+    assert [report["extension"] for report in reports] == [nulls, array, encrypted, nulls]
+    assert reports[0]["threat_count"] > 0 and reports[0]["permissions"]["risk_score"] == 0
+    assert reports[1]["name"] is None and reports[1]["files_scanned"] == 1
+    assert [error["file"] for error in reports[2]["errors"]] == ["secret.js"]
+    assert reports[2]["files_scanned"] == 1 and reports[2]["threat_count"] > 0
+    # The same path listed twice is scanned and reported twice, not overwritten
+    assert reports[3]["files_scanned"] == reports[0]["files_scanned"] == 1
@@ -0,0 +1,56 @@
+from concurrent.futures import Future
+
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from ml_analyzer import BatchingAnalyzer, MLThreatAnalyzer, synthetic_training_data
+
+GOOD = {'type': 'eval', 'severity': 'high', 'code': 'eval(atob(x))', 'patterns': ['eval']}
+BAD = {'type': None, 'code': 'document.cookie'}
+
+
+def fitted_analyzer():
+    data = synthetic_training_data()
+    scaler = StandardScaler().fit(data)
+    model = IsolationForest(n_estimators=20, random_state=42).fit(scaler.transform(data))
+    return MLThreatAnalyzer(scaler, model, 'test')
+
+
+class FlakyBatches(MLThreatAnalyzer):
+    """Scores threats one at a time but fails any batch of several"""
+
+    def analyze_batch(self, threats, features=None):
+        if len(threats) > 1:
+            raise RuntimeError('batch scoring failed')
+        return super().analyze_batch(threats, features)
+
+
+def submit_together(batcher, threats):
+    """Queue threats so one worker batch picks them all up"""
+    futures = []
+    for threat in threats:
+        future = Future()
+        futures.append(future)
+        batcher._queue.put((threat, future, 0.0))
+    return futures
+
+
+def test_bad_threat_fails_only_its_own_future():
+    batcher = BatchingAnalyzer(fitted_analyzer(), max_wait_ms=50)
+    futures = submit_together(batcher, [GOOD, BAD, GOOD])
+    assert isinstance(futures[1].exception(timeout=5), TypeError)
+    good, other = futures[0].result(timeout=5), futures[2].result(timeout=5)
+    assert good[0] == other[0]
+    assert good[0]['risk_level'] in ('low', 'medium', 'high', 'critical')
+    assert good[1].shape == (12,)
+
+
+def test_failed_batch_is_scored_item_by_item():
+    plain = fitted_analyzer()
+    batcher = BatchingAnalyzer(FlakyBatches(plain.scaler, plain.isolation_forest, 'test'), max_wait_ms=50)
+    futures = submit_together(batcher, [GOOD, BAD, GOOD])
+    assert futures[0].result(timeout=5)[0] == plain.analyze(GOOD)
+    with pytest.raises(TypeError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5)[0] == plain.analyze(GOOD)
@@ -0,0 +1,49 @@
+from concurrent.futures import Future
+
+import ml_analyzer
+import model_retraining
+from model_retraining import RetrainingJob
+from model_store import ARTIFACT_NAME
+
+
+class InlineExecutor:
+    """Runs the submitted retrain in this process"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_version_that_fails_to_load_is_never_made_current(tmp_path, monkeypatch):
+    monkeypatch.setattr(ml_analyzer, 'LEGACY_MODEL_PATH', str(tmp_path / 'threat_model.pkl'))
+    job = RetrainingJob({}, str(tmp_path / 'store'))
+    served = ml_analyzer.load_from_store(job.store)
+    seeded = job.store.current_version()
+
+    def corrupt_retrain(db_config, store_dir, min_rows):
+        version = job.store.publish(served.scaler, served.isolation_forest, make_current=False)
+        with open(tmp_path / 'store' / version / ARTIFACT_NAME, 'ab') as f:
+            f.write(b'corrupt')
+        return {'accepted': True, 'version': version}
+
+    installed = []
+    monkeypatch.setattr(model_retraining, 'ProcessPoolExecutor', InlineExecutor)
+    monkeypatch.setattr(model_retraining, 'retrain', corrupt_retrain)
+    monkeypatch.setattr(model_retraining, 'install_analyzer', installed.append)
+
+    result = job.run_once()
+
+    assert result['accepted'] is False
+    assert 'checksum mismatch' in result['reason']
+    assert job.store.current_version() == seeded
+    assert installed == []
@@ -0,0 +1,17 @@
+import os
+
+import ml_analyzer
+from model_store import ModelStore
+
+
+def test_seeding_persists_only_to_the_store(tmp_path, monkeypatch):
+    legacy_path = tmp_path / 'models' / 'threat_model.pkl'
+    monkeypatch.setattr(ml_analyzer, 'LEGACY_MODEL_PATH', str(legacy_path))
+    store = ModelStore(str(tmp_path / 'store'))
+
+    analyzer = ml_analyzer.load_from_store(store)
+
+    assert not legacy_path.exists()
+    assert not os.path.exists(tmp_path / 'models')
+    assert analyzer.model_version == store.current_version()
+    assert store.manifest(analyzer.model_version)['metadata']['source'] == 'seed'
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from rule_packs import RulePackWatcher, build_engine, load_pack
+
+
+def write_pack(tmp_path, patterns):
+    return write_rules(tmp_path, {"evil": {"patterns": patterns, "severity": "high", "description": "Evil"}})
+
+
+def write_rules(tmp_path, rules, name="pack.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps({"name": "test", "version": "1", "rules": rules}))
+    return str(path)
+
+
+def test_rejects_inline_global_flags(tmp_path):
+    with pytest.raises(ValueError, match="global flags"):
+        load_pack(write_pack(tmp_path, ["(?i)evilthing"]))
+
+
+def test_rejects_numbered_backreference(tmp_path):
+    with pytest.raises(ValueError, match="backreferences"):
+        load_pack(write_pack(tmp_path, [r"(['\"])evilq\1"]))
+
+
+def test_accepted_pack_matches_in_combined_engine(tmp_path):
+    pack = load_pack(write_pack(tmp_path, [r"evil(thing)+", r"other\s*rule"]))
+    engine = build_engine({"builtin": {"patterns": [r"eval\s*\("], "severity": "high",
+                                       "description": "Eval"}}, [pack])
+    matched, _ = engine.match_rules("x = EVILTHING; eval(y); other rule")
+    assert [engine.rules[i][0] for i in matched] == ["builtin", "evil", "evil"]
+
+
+def test_analysis_cache_is_json_and_tampering_is_ignored(tmp_path):
+    pack = load_pack(write_pack(tmp_path, [r"evil(thing)+"]))
+    cache_dir = tmp_path / ".compiled"
+    first = build_engine({}, [pack], str(cache_dir))
+    (artifact,) = cache_dir.iterdir()
+    assert json.loads(artifact.read_text())["digest"] == first.digest
+
+    artifact.write_text(json.dumps({"digest": first.digest, "clauses": "nope"}))
+    engine = build_engine({}, [pack], str(cache_dir))
+    assert engine.match_rules("evilthing")[0] == [0]
+    assert json.loads(artifact.read_text())["clauses"] == first.analysis["clauses"]
+
+
+def test_rejects_rule_that_is_not_a_mapping(tmp_path):
+    with pytest.raises(ValueError, match="must be a mapping"):
+        load_pack(write_rules(tmp_path, {"evil": ["evilthing"]}))
+
+
+def test_rejects_pattern_that_is_not_a_string(tmp_path):
+    with pytest.raises(ValueError, match="must be a string"):
+        load_pack(write_pack(tmp_path, ["evilthing", 42]))
+
+
+def test_malformed_pack_keeps_builtin_signatures_at_boot(tmp_path):
+    write_rules(tmp_path, {"evil": "evilthing"})
+    installed = []
+    watcher = RulePackWatcher(str(tmp_path), {}, installed.append, poll_interval=60).start()
+    try:
+        assert installed == []
+        assert watcher._thread.is_alive()
+    finally:
+        watcher.stop()
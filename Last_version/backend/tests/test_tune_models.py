@@ -0,0 +1,22 @@
+import tune_models
+
+
+def test_forest_grid_point(tmp_path):
+    features_path, labels_path = tune_models.build_cache(None, str(tmp_path))
+    assert tune_models.build_cache(None, str(tmp_path)) == (features_path, labels_path)
+
+    tune_models._open_cache(features_path, labels_path)
+    result = tune_models.evaluate_forest({"contamination": 0.2, "n_estimators": 20})
+
+    assert result["model"] == "forest"
+    assert 0.5 < result["balanced_accuracy"] <= 1.0
+    assert result["detection_rate"] is not None and result["false_positive_rate"] is not None
+
+
+def test_autoencoder_grid_point(tmp_path):
+    tune_models._open_cache(*tune_models.build_cache(None, str(tmp_path)))
+    result = tune_models.evaluate_autoencoder({"encoding_dim": 4, "threshold_percentile": 95})
+
+    assert result["model"] == "autoencoder"
+    assert result["params"] == {"encoding_dim": 4, "threshold_percentile": 95}
+    assert 0.5 < result["balanced_accuracy"] <= 1.0
@@ -3,8 +3,21 @@ Threat intelligence and pattern matching
 Complements AI analysis with known threat signatures
 """
 
-import re
-from typing import Dict, List
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Dict, List, Optional, Sequence, Union
+
+try:
+    from signature_engine import STREAM_CHUNK_SIZE, SignatureEngine, read_text_chunks
+    from domain_index import DomainIndex, extract_hosts
+    from rule_packs import RulePackWatcher, build_engine, load_pack
+    from permission_scoring import PermissionScorer
+except ImportError:
+    from .signature_engine import STREAM_CHUNK_SIZE, SignatureEngine, read_text_chunks
+    from .domain_index import DomainIndex, extract_hosts
+    from .rule_packs import RulePackWatcher, build_engine, load_pack
+    from .permission_scoring import PermissionScorer
 
 class ThreatIntelligence:
     """Threat intelligence database and pattern matcher"""
@@ -82,13 +95,95 @@ class ThreatIntelligence:
         {"apis": ["chrome.tabs", "chrome.webRequest", "fetch"], "risk": "man_in_middle"},
         {"apis": ["chrome.debugger", "chrome.tabs"], "risk": "remote_debugging"},
     ]
+
+    DANGEROUS_PERMISSIONS = {
+        "webRequest": 15, "webRequestBlocking": 20, "cookies": 15,
+        "debugger": 25, "<all_urls>": 20, "tabs": 10, "history": 8
+    }
+
+    # Bitmask scoring of permission sets for analyze_permissions_batch
+    permission_scorer = PermissionScorer(DANGEROUS_PERMISSIONS, SUSPICIOUS_COMBINATIONS)
+
+    # All signatures compiled once into a single matcher; rule packs replace it
+    # with an engine for the built-in plus external signatures
+    _engine = SignatureEngine(MALICIOUS_PATTERNS)
+    signature_version = _engine.version
+
+    # Matches listed domains and their subdomains; load_domain_feed adds IOC feeds
+    domain_index = DomainIndex.from_domains(MALICIOUS_DOMAINS)
     
     @classmethod
-    def scan_code(cls, code: str) -> Dict:
-        """Scan code for known malicious patterns"""
+    def scan_code(cls, code: str, linear: bool = False,
+                  time_budget: Optional[float] = None) -> Dict:
+        """
+        Scan code for known malicious patterns.
+        linear: search every rule in guaranteed linear time (for untrusted bundles);
+        the default combined search is faster on typical code but can backtrack
+        for a long time on adversarial input
+        time_budget: seconds to spend at most, implies linear; rules left
+        unchecked are reported in "cut_off_rules"
+        """
+        # One engine for the whole scan, even if a rule pack reload swaps it meanwhile
+        engine = cls._engine
         if not code:
-            return {"threats": [], "risk_score": 0.0, "threat_count": 0}
+            matched, cut_off = [], []
+        else:
+            matched, cut_off = engine.match_rules(code, linear=linear, time_budget=time_budget)
+
+        result = cls._build_result(engine, matched)
+        if time_budget is not None:
+            result["cut_off_rules"] = [
+                {"type": engine.rules[rule_id][0], "pattern": engine.rules[rule_id][1]}
+                for rule_id in cut_off
+            ]
+        return result
+
+    @classmethod
+    def scan_file(cls, source: Union[str, os.PathLike, IO[bytes]],
+                  chunk_size: int = STREAM_CHUNK_SIZE) -> Dict:
+        """
+        Scan a file path or binary stream without loading it whole.
+        Files are memory-mapped and read chunk_size bytes at a time; the result
+        has the same structure as scan_code.
+        """
+        engine = cls._engine
+        matched = engine.match_stream(read_text_chunks(source, chunk_size))
+        return cls._build_result(engine, matched)
 
+    @classmethod
+    def scan_many(cls, codes: Sequence[str], linear: bool = False,
+                  max_workers: Optional[int] = None, time_budget: Optional[float] = None) -> List[Dict]:
+        """
+        Scan a batch of snippets, returning one scan_code result per input in
+        input order. Identical snippets are scanned once and share the same
+        result dict. With max_workers the unique snippets are spread over a
+        process pool running the current signatures; worth it for batches of
+        large bundles, for short snippets pool start-up costs more than it saves.
+        time_budget: seconds for the whole batch (implies linear); each snippet
+        gets what is left, so snippets reached after it ran out report every
+        candidate rule in "cut_off_rules"
+        """
+        # dict keys hash each snippet; first occurrences keep their order
+        unique = list(dict.fromkeys(codes))
+        # Wall-clock, so pool workers can check it too
+        deadline = time.time() + time_budget if time_budget is not None else None
+        if max_workers and len(unique) > 1:
+            engine = cls._engine
+            with ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_scan_worker,
+                initargs=(engine.signatures, engine.flags, engine.label, engine.analysis)
+            ) as pool:
+                chunksize = max(1, len(unique) // (max_workers * 4))
+                scanned = list(pool.map(_scan_worker, unique, [linear] * len(unique),
+                                        [deadline] * len(unique), chunksize=chunksize))
+        else:
+            scanned = [_scan_worker(code, linear, deadline) for code in unique]
+
+        results = dict(zip(unique, scanned))
+        return [results[code] for code in codes]
+
+    @classmethod
+    def _build_result(cls, engine: SignatureEngine, matched: List[int]) -> Dict:
         detected_threats = []
         risk_score = 0.0
         
@@ -99,25 +194,77 @@ class ThreatIntelligence:
             "low": 3
         }
 
-        for threat_type, config in cls.MALICIOUS_PATTERNS.items():
-            for pattern in config["patterns"]:
-                if re.search(pattern, code, re.IGNORECASE):
-                    detected_threats.append({
-                        "type": threat_type,
-                        "severity": config["severity"],
-                        "description": config["description"]
-                    })
-                    risk_score += severity_scores.get(config["severity"], 5)
+        for rule_id in matched:
+            threat_type = engine.rules[rule_id][0]
+            config = engine.signatures[threat_type]
+            detected_threats.append({
+                "type": threat_type,
+                "severity": config["severity"],
+                "description": config["description"]
+            })
+            risk_score += severity_scores.get(config["severity"], 5)
         
         return {
             "threats": detected_threats,
             "risk_score": min(risk_score, 100.0),
-            "threat_count": len(detected_threats)
+            "threat_count": len(detected_threats),
+            "signature_version": engine.version
         }
 
+    @classmethod
+    def install_engine(cls, engine: SignatureEngine):
+        """Switch new scans to engine; a single attribute swap, so no lock is needed"""
+        cls._engine = engine
+        cls.signature_version = engine.version
+
+    @classmethod
+    def load_rule_packs(cls, paths: List[str], cache_dir: Optional[str] = None) -> str:
+        """Install the built-in signatures plus the given packs, returns the new version"""
+        engine = build_engine(cls.MALICIOUS_PATTERNS, [load_pack(path) for path in paths], cache_dir)
+        cls.install_engine(engine)
+        return engine.version
+
+    @classmethod
+    def watch_rule_packs(cls, directory: str, poll_interval: float = 5.0) -> RulePackWatcher:
+        """
+        Load every pack in directory now and reload whenever one is added,
+        changed or removed. Compiled rule analysis is kept in directory/.compiled.
+        """
+        return RulePackWatcher(directory, cls.MALICIOUS_PATTERNS, cls.install_engine, poll_interval).start()
+
+    @classmethod
+    def load_domain_feed(cls, path: str) -> int:
+        """
+        Add a blocklist to the domain index: one domain or hosts-file line per
+        line, or an index written by DomainIndex.save (".idx"). Returns the
+        number of indexed domains.
+        """
+        feed = DomainIndex.load(path) if path.endswith(".idx") else DomainIndex.from_file(path)
+        cls.domain_index = cls.domain_index.merge(feed)
+        return len(cls.domain_index)
+
     @classmethod
     def check_domain(cls, domain: str) -> bool:
-        return domain.lower() in cls.MALICIOUS_DOMAINS
+        return cls.domain_index.match(domain) is not None
+
+    @classmethod
+    def scan_urls(cls, code: str, url: Optional[str] = None) -> List[Dict]:
+        """Check the host of every URL in code, and of url, against the domain index"""
+        hosts = extract_hosts(code or "")
+        if url:
+            hosts += [host for host in extract_hosts(url) if host not in hosts]
+
+        hits = []
+        for host in hosts:
+            listed = cls.domain_index.match(host)
+            if listed is not None:
+                hits.append({
+                    "host": host,
+                    "listed_domain": listed,
+                    "severity": "critical",
+                    "description": f"Known malicious domain: {host}"
+                })
+        return hits
 
     @classmethod
     def analyze_permissions(cls, permissions: List[str]) -> Dict:
@@ -125,12 +272,7 @@ class ThreatIntelligence:
         risk_score = 0.0
         perm_set = set(permissions)
         
-        dangerous_perms = {
-            "webRequest": 15, "webRequestBlocking": 20, "cookies": 15,
-            "debugger": 25, "<all_urls>": 20, "tabs": 10, "history": 8
-        }
-        
-        for perm, score in dangerous_perms.items():
+        for perm, score in cls.DANGEROUS_PERMISSIONS.items():
             if perm in perm_set:
                 risk_score += score
                 risk_flags.append(f"Dangerous permission: {perm}")
@@ -143,4 +285,19 @@ class ThreatIntelligence:
         return {
             "risk_score": min(risk_score, 100.0),
             "flags": risk_flags
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def analyze_permissions_batch(cls, permission_lists: Sequence[List[str]]) -> List[Dict]:
+        """analyze_permissions for many extensions at once, results in input order"""
+        return cls.permission_scorer.analyze(permission_lists)
+
+
+def _init_scan_worker(signatures: Dict[str, Dict], flags: int, label: str, analysis: Dict):
+    """Pool initializer: workers scan with the parent's engine, rule packs included"""
+    ThreatIntelligence.install_engine(SignatureEngine(signatures, flags, label=label, analysis=analysis))
+
+
+def _scan_worker(code: str, linear: bool, deadline: Optional[float] = None) -> Dict:
+    time_budget = max(deadline - time.time(), 0.0) if deadline is not None else None
+    return ThreatIntelligence.scan_code(code, linear=linear, time_budget=time_budget)
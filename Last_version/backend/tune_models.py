@@ -0,0 +1,250 @@
+"""
+Hyperparameter search for the IsolationForest and autoencoder anomaly models
+Extracts features once into an .npy cache, evaluates a parameter grid on a
+process pool that maps that cache read-only, and writes a leaderboard
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from autoencoder_scorer import CompiledAutoencoder
+from ml_analyzer import synthetic_training_data
+from model_retraining import HOLDOUT_EVERY, MALICIOUS_LABELS, balanced_accuracy
+
+# Same layer widths around the bottleneck as BehaviorAutoencoder.build_model
+AUTOENCODER_LAYERS = (64, 32, 16)
+AUTOENCODER_EPOCHS = 50
+
+# Set in each pool worker by _open_cache
+_features = None
+_labels = None
+
+
+def build_cache(data_path: str, cache_dir: str) -> Tuple[str, str]:
+    """
+    Featurize a JSON-lines file of {"features": [...] or threat object, "label": ...}
+    into <hash>.X.npy / <hash>.y.npy, keyed by the file content, so repeated
+    runs skip extraction. Without data_path the synthetic baseline is cached.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = hashlib.sha256(b"synthetic-v2")
+    if data_path:
+        with open(data_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    key = digest.hexdigest()[:16]
+    features_path = os.path.join(cache_dir, f"{key}.X.npy")
+    labels_path = os.path.join(cache_dir, f"{key}.y.npy")
+    if os.path.exists(features_path) and os.path.exists(labels_path):
+        return features_path, labels_path
+
+    if data_path:
+        from ml_analyzer import MLThreatAnalyzer
+
+        vectors, threats = [], []
+        with open(data_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    (threats if isinstance(row["features"], dict) else vectors).append(row)
+        chunks = []
+        if vectors:
+            chunks.append(np.array([row["features"] for row in vectors], dtype=np.float64))
+        if threats:
+            featurizer = MLThreatAnalyzer.__new__(MLThreatAnalyzer)  # extraction needs no model
+            chunks.append(featurizer.extract_features_batch([row["features"] for row in threats],
+                                                            dtype=np.float64))
+        labels = [str(row["label"]).lower() in MALICIOUS_LABELS for row in vectors + threats]
+        X, y = np.vstack(chunks), np.array(labels, dtype=bool)
+    else:
+        np.random.seed(0)  # synthetic_training_data draws from the global generator
+        X = synthetic_training_data()
+        y = np.arange(len(X)) >= len(X) * 4 // 5  # normal rows first, then malicious
+
+    order = np.random.default_rng(1).permutation(len(X))
+    np.save(features_path, X[order])
+    np.save(labels_path, y[order])
+    return features_path, labels_path
+
+
+def _open_cache(features_path: str, labels_path: str):
+    """Pool initializer: map the cached matrices read-only, shared through the page cache"""
+    global _features, _labels
+    _features = np.load(features_path, mmap_mode="r")
+    _labels = np.load(labels_path, mmap_mode="r")
+
+
+def _metrics(flagged: np.ndarray, is_malicious: np.ndarray) -> Dict:
+    return {
+        "balanced_accuracy": round(balanced_accuracy(flagged, is_malicious), 4),
+        "detection_rate": round(float(flagged[is_malicious].mean()), 4) if is_malicious.any() else None,
+        "false_positive_rate": round(float(flagged[~is_malicious].mean()), 4) if (~is_malicious).any() else None,
+    }
+
+
+def _splits():
+    """
+    build_cache shuffled the rows, so the last 1/HOLDOUT_EVERY is a random holdout;
+    slicing keeps both splits views of the mapped cache instead of per-worker copies
+    """
+    split = len(_features) - len(_features) // HOLDOUT_EVERY
+    return _features[:split], _features[split:], np.asarray(_labels[:split]), np.asarray(_labels[split:])
+
+
+def evaluate_forest(params: Dict) -> Dict:
+    """Pool task: fit one IsolationForest configuration on the training split and score the holdout"""
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+
+    train, test, _, is_malicious = _splits()
+    started = time.perf_counter()
+    scaler = StandardScaler()
+    model = IsolationForest(random_state=42, **params).fit(scaler.fit_transform(train))
+    fit_s = time.perf_counter() - started
+    started = time.perf_counter()
+    flagged = model.decision_function(scaler.transform(test)) < 0
+    score_s = time.perf_counter() - started
+
+    return {
+        "model": "forest",
+        "params": params,
+        "fit_s": round(fit_s, 3),
+        "score_us_per_row": round(score_s / max(len(test), 1) * 1e6, 2),
+        **_metrics(flagged, is_malicious),
+    }
+
+
+def fit_autoencoder(normal: np.ndarray, encoding_dim: int, threshold_percentile: float,
+                    epochs: int = AUTOENCODER_EPOCHS) -> CompiledAutoencoder:
+    """
+    Fit a dense autoencoder on normal rows without TensorFlow (sklearn's
+    MLPRegressor learning X -> X) and return it as a CompiledAutoencoder, the
+    NumPy scorer the exported Keras model is served with. The threshold is
+    threshold_percentile of the training reconstruction errors, as in
+    BehaviorAutoencoder.train.
+    """
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.neural_network import MLPRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler().fit(normal)
+    X = scaler.transform(normal)
+    hidden = AUTOENCODER_LAYERS + (encoding_dim,) + AUTOENCODER_LAYERS[::-1]
+    network = MLPRegressor(hidden_layer_sizes=hidden, activation="relu", batch_size=32,
+                           max_iter=epochs, random_state=42)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)  # a fixed epoch budget, like Keras
+        network.fit(X, X)
+
+    arrays = {"activations": np.array(["relu"] * len(hidden) + ["linear"]),
+              "scaler_mean": scaler.mean_, "scaler_scale": scaler.scale_, "anomaly_threshold": np.float64(1)}
+    for i, (kernel, bias) in enumerate(zip(network.coefs_, network.intercepts_)):
+        arrays[f"kernel_{i}"] = kernel.astype(np.float32)
+        arrays[f"bias_{i}"] = bias.astype(np.float32)
+    compiled = CompiledAutoencoder(arrays)
+    compiled.anomaly_threshold = float(np.percentile(compiled.reconstruction_error(normal), threshold_percentile))
+    return compiled
+
+
+def evaluate_autoencoder(params: Dict) -> Dict:
+    """Pool task: fit one autoencoder configuration on the normal training rows and score the holdout"""
+    train, test, train_malicious, is_malicious = _splits()
+    started = time.perf_counter()
+    compiled = fit_autoencoder(np.asarray(train[~train_malicious]), **params)
+    fit_s = time.perf_counter() - started
+    started = time.perf_counter()
+    flagged = compiled.reconstruction_error(test) > compiled.anomaly_threshold
+    score_s = time.perf_counter() - started
+
+    return {
+        "model": "autoencoder",
+        "params": params,
+        "fit_s": round(fit_s, 3),
+        "score_us_per_row": round(score_s / max(len(test), 1) * 1e6, 2),
+        **_metrics(flagged, is_malicious),
+    }
+
+
+def parameter_grid(args) -> List[Tuple[Callable[[Dict], Dict], Dict]]:
+    grid = []
+    if "forest" in args.models:
+        grid += [
+            (evaluate_forest, {"contamination": contamination, "n_estimators": n_estimators})
+            for contamination, n_estimators in itertools.product(args.contamination, args.n_estimators)
+        ]
+    if "autoencoder" in args.models:
+        grid += [
+            (evaluate_autoencoder, {"encoding_dim": encoding_dim, "threshold_percentile": percentile})
+            for encoding_dim, percentile in itertools.product(args.encoding_dim, args.threshold_percentile)
+        ]
+    return grid
+
+
+def _evaluate(task: Tuple[Callable[[Dict], Dict], Dict]) -> Dict:
+    evaluate, params = task
+    return evaluate(params)
+
+
+def _number_list(kind):
+    return lambda text: [kind(value) for value in text.split(",")]
+
+
+def _model_list(text):
+    models = text.split(",")
+    unknown = set(models) - {"forest", "autoencoder"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown model(s): {', '.join(sorted(unknown))}")
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", help="JSON lines of {\"features\": ..., \"label\": ...} "
+                                       "(default: synthetic baseline)")
+    parser.add_argument("--cache-dir", default=os.path.join("models", "feature_cache"))
+    parser.add_argument("--contamination", type=_number_list(float), default=[0.05, 0.1, 0.15, 0.2])
+    parser.add_argument("--n-estimators", type=_number_list(int), default=[50, 100, 200])
+    parser.add_argument("--models", type=_model_list, default=["forest", "autoencoder"])
+    parser.add_argument("--encoding-dim", type=_number_list(int), default=[4, 8, 12])
+    parser.add_argument("--threshold-percentile", type=_number_list(float), default=[90, 95, 99])
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: all cores)")
+    parser.add_argument("--output", default="leaderboard.json")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    features_path, labels_path = build_cache(args.data, args.cache_dir)
+    grid = parameter_grid(args)
+    print(f"{len(grid)} configurations on {len(np.load(features_path, mmap_mode='r'))} rows "
+          f"(cache {features_path})")
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_open_cache,
+                             initargs=(features_path, labels_path)) as pool:
+        results = list(pool.map(_evaluate, grid))
+
+    results.sort(key=lambda result: (-result["balanced_accuracy"], result["score_us_per_row"]))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'rank':<6}{'model':<13}{'params':<48}{'bal.acc':>9}{'TPR':>8}{'FPR':>8}{'fit s':>9}{'us/row':>9}")
+    for rank, result in enumerate(results, 1):
+        params = ", ".join(f"{key}={value}" for key, value in result["params"].items())
+        print(f"{rank:<6}{result['model']:<13}{params:<48}{result['balanced_accuracy']:>9.4f}"
+              f"{result['detection_rate'] if result['detection_rate'] is not None else '-':>8}"
+              f"{result['false_positive_rate'] if result['false_positive_rate'] is not None else '-':>8}"
+              f"{result['fit_s']:>9.2f}{result['score_us_per_row']:>9.2f}")
+    print(f"\nLeaderboard written to {args.output} ({time.perf_counter() - started:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
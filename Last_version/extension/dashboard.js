@@ -186,6 +186,11 @@ function connectWebSocket() {
     handleNewThreat(threat);
   });
 
+  socket.on("threat_enriched", (update) => {
+    console.log("[Dashboard] AI analysis received:", update);
+    handleThreatEnriched(update);
+  });
+
   socket.on("scan_complete", (data) => {
     console.log("[Dashboard] Scan complete:", data);
     fetchInitialData(); // Refresh all data
@@ -452,6 +457,18 @@ function handleNewThreat(threat) {
   );
 }
 
+/**
+ * Fill in the AI analysis of a threat that arrived with ai_status "pending"
+ */
+function handleThreatEnriched(update) {
+  const threat = state.threats.find((t) => t.id === update.id);
+  if (!threat) return;
+
+  threat.ai_analysis = update.ai_analysis;
+  threat.ai_status = update.ai_status;
+  updateThreatFeed();
+}
+
 /**
  * Setup Event Listeners
  */